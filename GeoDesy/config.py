@@ -4,7 +4,13 @@ __all__ = (
     "SECRET_KEY", "ALLOWED_HOSTS", "CORS_ALLOWED_ORIGINS", "CSRF_TRUSTED_ORIGINS", "EMAIL_HOST", "EMAIL_PORT",
     "EMAIL_HOST_USER", "EMAIL_HOST_PASSWORD", "DJANGO_SUPERUSER_EMAIL", "DJANGO_SUPERUSER_PASSWORD",
     "OFFSET_TIMEZONE", "LENGTH_CONFIRM_CODE", "INTERVAL_CONFIRM_CODE_IN_SECONDS", "INTERVAL_API_TOKEN_IN_SECONDS",
-    "MIN_DISTANCE_BETWEEN_POINTS", "COORD_ROUND_SCALE"
+    "MIN_DISTANCE_BETWEEN_POINTS", "COORD_ROUND_SCALE", "SPATIAL_CELL_LEVEL", "SPATIAL_CELL_MAX_COVERING",
+    "SPATIAL_INDEX_ENABLED", "SPATIAL_INDEX_CHANNEL", "SPATIAL_INDEX_COMPACT_THRESHOLD", "SPATIAL_INDEX_SNAPSHOT",
+    "SPATIAL_INDEX_SNAPSHOT_MARGIN_IN_SECONDS", "MAP_MAX_ZOOM", "MAP_CLUSTER_LEVEL_OFFSET", "MAP_CLUSTER_MAX_CELLS",
+    "MAP_CLUSTER_POINTS_ZOOM", "MAP_CLUSTER_MAX_POINTS", "MAP_CLUSTER_CACHE_TIMEOUT_IN_SECONDS", "MAP_TILE_MIN_ZOOM",
+    "MAP_TILE_COORD_SCALE", "MAP_STREAM_CHUNK_SIZE", "CARD_CACHE_BACKEND", "CARD_CACHE_LOCATION", "CARD_CACHE_ALIAS",
+    "CARD_COUNT_CACHE_TIMEOUT_IN_SECONDS", "CARD_INFO_CACHE_TIMEOUT_IN_SECONDS", "CARD_EXPORT_CHUNK_SIZE",
+    "CARD_BATCH_MAX_SIZE", "CARD_UPDATE_BATCH_MAX_SIZE"
 )
 
 env = environs.Env()
@@ -23,9 +29,35 @@ EMAIL_HOST_PASSWORD = env.str('EMAIL_PASSWORD')
 DJANGO_SUPERUSER_EMAIL = env.str('DJANGO_SUPERUSER_EMAIL')
 DJANGO_SUPERUSER_PASSWORD = env.str('DJANGO_SUPERUSER_PASSWORD')
 
+SPATIAL_INDEX_ENABLED = env.bool('SPATIAL_INDEX_ENABLED', False)
+SPATIAL_INDEX_SNAPSHOT = env.str('SPATIAL_INDEX_SNAPSHOT', None)
+
+CARD_CACHE_BACKEND = env.str('CARD_CACHE_BACKEND', 'file')
+CARD_CACHE_LOCATION = env.str('CARD_CACHE_LOCATION', '')
+
 OFFSET_TIMEZONE = 3
 LENGTH_CONFIRM_CODE = 6
 INTERVAL_CONFIRM_CODE_IN_SECONDS = 200
 INTERVAL_API_TOKEN_IN_SECONDS = 18000
 MIN_DISTANCE_BETWEEN_POINTS = 100
 COORD_ROUND_SCALE = 8
+SPATIAL_CELL_LEVEL = 26
+SPATIAL_CELL_MAX_COVERING = 16
+SPATIAL_INDEX_CHANNEL = "geopoint_changed"
+SPATIAL_INDEX_COMPACT_THRESHOLD = 1024
+SPATIAL_INDEX_SNAPSHOT_MARGIN_IN_SECONDS = 300
+MAP_MAX_ZOOM = 22
+MAP_CLUSTER_LEVEL_OFFSET = 2
+MAP_CLUSTER_MAX_CELLS = 4096
+MAP_CLUSTER_POINTS_ZOOM = 14
+MAP_CLUSTER_MAX_POINTS = 2000
+MAP_CLUSTER_CACHE_TIMEOUT_IN_SECONDS = 300
+MAP_TILE_MIN_ZOOM = 8
+MAP_TILE_COORD_SCALE = 10 ** 7
+MAP_STREAM_CHUNK_SIZE = 2000
+CARD_CACHE_ALIAS = "cards"
+CARD_COUNT_CACHE_TIMEOUT_IN_SECONDS = 300
+CARD_INFO_CACHE_TIMEOUT_IN_SECONDS = 60
+CARD_EXPORT_CHUNK_SIZE = 500
+CARD_BATCH_MAX_SIZE = 50
+CARD_UPDATE_BATCH_MAX_SIZE = 200
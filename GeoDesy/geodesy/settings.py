@@ -92,6 +92,28 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# кэш CARD_CACHE_ALIAS должен быть общим для рабочих процессов: сброс версии после изменения карточек
+# в одном процессе должен быть виден остальным, поэтому хранилища в памяти процесса (locmem) не допускаются
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    CARD_CACHE_ALIAS: {
+        "BACKEND": {
+            "file": "django.core.cache.backends.filebased.FileBasedCache",
+            "redis": "django.core.cache.backends.redis.RedisCache",
+            "none": "django.core.cache.backends.dummy.DummyCache",
+        }[CARD_CACHE_BACKEND],
+        "LOCATION": CARD_CACHE_LOCATION or (BASE_DIR / "cache" if CARD_CACHE_BACKEND == "file" else ""),
+        "OPTIONS": {
+            "MAX_ENTRIES": 10000,
+        } if CARD_CACHE_BACKEND == "file" else {},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -155,6 +177,20 @@ SPECTACULAR_SETTINGS = {
     'SWAGGER_UI_FAVICON_HREF': 'SIDECAR',
     'REDOC_DIST': 'SIDECAR',
     'COMPONENT_SPLIT_REQUEST': True,
+    # наборы значений состояния пункта используются и в карточке, и в фильтре списка карточек
+    'ENUM_NAME_OVERRIDES': {
+        'DetectedPropertyValueEnum': 'utils.card_tools.choices.DetectedPropertyChoice',
+        'SavingPropertyValueEnum': 'utils.card_tools.choices.SavingPropertyChoice',
+        'CoveringPropertyValueEnum': 'utils.card_tools.choices.CoveringPropertyChoice',
+        'ReadingPropertyValueEnum': 'utils.card_tools.choices.ReadingPropertyChoice',
+        'PossiblePropertyValueEnum': 'utils.card_tools.choices.PossiblePropertyChoice',
+        'TypeSignValueEnum': 'utils.card_tools.choices.TypeSignChoice.choices',
+        # статусы карточки, ее проверки и результаты пакетов карточек (card/create/batch, card/update/batch)
+        'CardStatusEnum': 'main_app.models.Card.StatusChoice',
+        'CardReviewStatusEnum': 'main_app.models.Card.StatusChoiceWithOutSending',
+        'CardBatchItemStatusEnum': 'main_app.schema.v1.cards.CREATE_CARD_BATCH_STATUSES',
+        'UpdateCardBatchStatusEnum': 'main_app.schema.v1.cards.UPDATE_CARD_BATCH_STATUSES',
+    },
 }
 
 EMAIL_USE_SSL = True
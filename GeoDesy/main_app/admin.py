@@ -65,6 +65,23 @@ class CardAdmin(DALFModelAdmin):
         "status"
     )
 
+    actions = ("accept_cards", "deny_cards")
+
+    def _review_cards(self, request, queryset, status):
+        card_uuids = list(queryset.values_list("card_uuid", flat=True))
+        items = [{"card_uuid": card_uuid, "status": status} for card_uuid in card_uuids]
+        results = Card.objects.update_batch(request.user, items=items)
+        updated = sum(1 for result, _ in results if result == "updated")
+        self.message_user(request, f"Карточек изменено: {updated} из {len(results)}")
+
+    @admin.action(description="Принять выбранные карточки")
+    def accept_cards(self, request, queryset):
+        self._review_cards(request, queryset, Card.SuccessChoice.SUCCESS)
+
+    @admin.action(description="Отвергнуть выбранные карточки")
+    def deny_cards(self, request, queryset):
+        self._review_cards(request, queryset, Card.DeniedChoice.DENIED)
+
     def response_change(self, request, obj):
         if "_download_pdf" in request.POST:
             return redirect("download_card", obj.card_uuid)
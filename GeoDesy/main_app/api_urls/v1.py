@@ -12,8 +12,17 @@ urlpatterns = [
     path('jwt/update/', UpdateJWTAPIView.as_view()),
     path('card/create/', CreateCardAPIView.as_view()),
     path('map/points/', GeoPointAPIView.as_view()),
+    path('map/points/stats/', GeoPointIndexStatsAPIView.as_view()),
+    path('map/clusters/', GeoClusterAPIView.as_view()),
+    path('map/tiles/<int:z>/<int:x>/<int:y>/', GeoTileAPIView.as_view()),
     path('card/create/', CreateCardAPIView.as_view()),
-    # path('card/update/', UpdateCardAPIView.as_view()),
+    path('card/create/batch/', CreateCardBatchAPIView.as_view()),
+    path('card/update/', UpdateCardAPIView.as_view()),
+    path('card/update/batch/', UpdateCardBatchAPIView.as_view()),
     path('card/info/', ShowCardAPIView.as_view()),
+    path('card/info/stats/', ShowCardCacheStatsAPIView.as_view()),
+    path('card/export/', ExportCardAPIView.as_view()),
+    path('card/changes/', CardChangesAPIView.as_view()),
+    path('card/statistics/', CardStatisticsAPIView.as_view()),
     path('card/download/<uuid:card_uuid>/', DownloadCardPDF.as_view(), name="download_card"),
 ]
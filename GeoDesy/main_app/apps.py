@@ -11,6 +11,7 @@ class MainAppConfig(AppConfig):
 
     def ready(self):
         super().ready()
+        import main_app.signals
         if settings.DEBUG:
             import main_app.schema
 
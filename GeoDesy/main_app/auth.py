@@ -7,7 +7,7 @@ from main_app.exceptions import InvalidTokenError, AuthenticationFailedAPIError
 from utils.context import CurrentContext
 
 __all__ = (
-    "JWTAuthentication",
+    "JWTAuthentication", "OptionalJWTAuthentication"
 )
 
 
@@ -37,4 +37,12 @@ class JWTAuthentication(authentication.BaseAuthentication):
             raise AuthenticationFailedAPIError(msg)
 
 
+class OptionalJWTAuthentication(JWTAuthentication):
+    """
+    Как JWTAuthentication, но запрос без заголовка Authorization выполняется анонимно.
+    """
 
+    def authenticate(self, request):
+        if request.META.get('HTTP_AUTHORIZATION', None) is None:
+            return None
+        return super().authenticate(request)
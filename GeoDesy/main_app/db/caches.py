@@ -0,0 +1,76 @@
+import hashlib
+import json
+import uuid
+from django.core.cache import caches
+from config import CARD_CACHE_ALIAS
+
+__all__ = ("VersionedNamespace", "card_counts", "card_responses")
+
+_MISSING = object()
+
+
+class VersionedNamespace:
+    """
+    Пространство имен ключей кэша Django с версией.
+
+    Версия входит в каждый ключ, поэтому invalidate() одной записью делает недоступными все значения
+    пространства (они вытесняются кэшем по времени жизни). Версия - случайная строка, а не счетчик:
+    если запись версии будет вытеснена, новая версия не совпадет ни с одной из прежних.
+    Счетчики попаданий и промахов ведутся в памяти процесса.
+    """
+
+    def __init__(self, name, alias="default"):
+        self.name = name
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def _version_key(self):
+        return f"{self.name}:version"
+
+    def get_version(self):
+        version = self.cache.get(self._version_key)
+        if version is None:
+            self.cache.add(self._version_key, uuid.uuid4().hex, None)
+            version = self.cache.get(self._version_key)
+        return version
+
+    def make_key(self, key_data):
+        # key_data - JSON-сериализуемое описание значения (нормализованные параметры запроса)
+        digest = hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{self.name}:{self.get_version()}:{digest}"
+
+    def get(self, key_data, default=None):
+        value = self.cache.get(self.make_key(key_data), _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return value
+
+    def set(self, key_data, value, timeout):
+        self.cache.set(self.make_key(key_data), value, timeout)
+
+    def invalidate(self):
+        self.cache.set(self._version_key, uuid.uuid4().hex, None)
+
+    def stats(self):
+        return {
+            "alias": self.alias,
+            "version": self.cache.get(self._version_key),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# общее число карточек в выборках card_info (count_mode="cached")
+card_counts = VersionedNamespace("card_count", alias=CARD_CACHE_ALIAS)
+
+# ответы card_info
+card_responses = VersionedNamespace("card_info", alias=CARD_CACHE_ALIAS)
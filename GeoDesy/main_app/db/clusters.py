@@ -0,0 +1,78 @@
+import math
+from django.core.cache import caches
+import config
+from main_app import models
+from utils.geo import Cell
+
+__all__ = ("MapClusterCache",)
+
+
+class MapClusterCache:
+    """
+    Кластеры точек карты по ячейкам utils.geo.Cell.
+
+    Уровень ячеек определяется масштабом карты, поэтому кластер - это ячейка целиком, и при сдвиге карты
+    кластеры не перестраиваются. Агрегаты ячеек хранятся в общем для процессов кэше CARD_CACHE_ALIAS
+    (как и ответы card_info) по ключу (уровень, ячейка), пустые ячейки кэшируются тоже. При изменении точки
+    или ее карточек сбрасываются все ячейки, содержащие точку (по одной на каждый уровень).
+    """
+    _KEY_PREFIX = "map_cluster"
+
+    @property
+    def cache(self):
+        return caches[config.CARD_CACHE_ALIAS]
+
+    @classmethod
+    def _cache_key(cls, level, key):
+        return f"{cls._KEY_PREFIX}:{level}:{key}"
+
+    @staticmethod
+    def get_level(boxes, zoom):
+        """
+        Уровень ячеек для масштаба zoom: при необходимости понижается, чтобы число ячеек
+        в прямоугольниках boxes не превышало MAP_CLUSTER_MAX_CELLS.
+        """
+        level = min(zoom + config.MAP_CLUSTER_LEVEL_OFFSET, Cell.LEVEL)
+        while level > 0 and sum(Cell.count(*box, level) for box in boxes) > config.MAP_CLUSTER_MAX_CELLS:
+            level -= 1
+
+        return level
+
+    @staticmethod
+    def _to_cluster(key, count, unit_vector, statuses):
+        if count == 0:
+            return {"cell": key, "count": 0}
+
+        x, y, z = unit_vector
+        return {
+            "cell": key,
+            "count": count,
+            "latitude": math.degrees(math.atan2(z, math.hypot(x, y))),
+            "longitude": math.degrees(math.atan2(y, x)),
+            "statuses": statuses,
+        }
+
+    def get_clusters(self, boxes, level):
+        keys = sorted({key for box in boxes for key in Cell.keys(*box, level)})
+        cache_keys = {key: self._cache_key(level, key) for key in keys}
+        cached = self.cache.get_many(cache_keys.values())
+
+        clusters = {key: cached[cache_key] for key, cache_key in cache_keys.items() if cache_key in cached}
+        missing = [key for key in keys if key not in clusters]
+        if missing:
+            aggregates = models.GeoPoint.objects.clusters(boxes, level, missing)
+            computed = {}
+            for key in missing:
+                count, unit_vector, statuses = aggregates.get(key, (0, None, {}))
+                computed[key] = self._to_cluster(key, count, unit_vector, statuses)
+
+            self.cache.set_many({cache_keys[key]: cluster for key, cluster in computed.items()},
+                           config.MAP_CLUSTER_CACHE_TIMEOUT_IN_SECONDS)
+            clusters.update(computed)
+
+        return [clusters[key] for key in keys if clusters[key]["count"] > 0]
+
+    def invalidate(self, cells):
+        self.cache.delete_many([
+            self._cache_key(level, Cell.parent(cell, level)) for cell in set(cells) for level in range(Cell.LEVEL + 1)
+        ])
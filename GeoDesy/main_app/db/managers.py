@@ -1,14 +1,27 @@
 from datetime import datetime, timedelta
-from django.db.models import QuerySet, Q
-from django.db import transaction
+from django.db.models import QuerySet, Q, F, Value, BooleanField, ExpressionWrapper, Sum, JSONField, Case, When, \
+    BigIntegerField
+from django.db.models.expressions import RawSQL, CombinedExpression
+from django.db.models.functions import Coalesce
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.utils import timezone
+from django.db import transaction, connections
 from django.contrib.auth.base_user import BaseUserManager
+import itertools
+import json
+import math
 import uuid
 import config
 from main_app import models
 from utils import auth_tools
-from utils import geo, card_tools
+from utils import geo, card_tools, map_tiles
+from utils.spatial_index import SPATIAL_INDEX_COLUMNS
+from main_app.db.spatial import SpatialIndexCache
+from main_app.db.clusters import MapClusterCache
+from main_app.db import caches
 
-__all__ = ("UserManager", "SessionQuerySet", "TFAQuerySet", "MapQuerySet", "CardQueryset")
+__all__ = ("UserManager", "SessionQuerySet", "TFAQuerySet", "MapQuerySet", "CardQueryset", "CardListingQuerySet",
+           "CardStatisticsQuerySet")
 
 
 class UserManager(BaseUserManager):
@@ -57,53 +70,231 @@ class TFAQuerySet(QuerySet):
 
 
 class MapQuerySet(QuerySet):
+    @classmethod
+    def _candidates_filter(cls, coord: geo.Coord, precision: float):
+        return cls._boxes_filter(geo.Geometry.bounding_boxes(coord, precision))
+
+    @staticmethod
+    def _boxes_filter(bounding_boxes):
+        cells, boxes = [], []
+        cells_params, boxes_params = [], []
+        for min_lat, max_lat, min_lon, max_lon in bounding_boxes:
+            for cell_range in geo.Cell.covering_ranges(min_lat, max_lat, min_lon, max_lon):
+                cells.append("cell between %s and %s")
+                cells_params.extend(cell_range)
+
+            boxes.append("latitude between %s and %s and longitude between %s and %s")
+            boxes_params.extend((min_lat, max_lat, min_lon, max_lon))
+
+        filter_sql = "({cells}) and ({boxes})".format(cells=" or ".join(cells), boxes=" or ".join(boxes))
+        return filter_sql, cells_params + boxes_params
+
+    def _from_index_rows(self, rows):
+        return [self.model.from_db(self.db, SPATIAL_INDEX_COLUMNS, row) for row in rows]
+
     def nearby_points(self, latitude: float, longitude: float, precision: float):
+        coord = geo.Coord(latitude=latitude, longitude=longitude)
+        return self.in_boxes(geo.Geometry.bounding_boxes(coord, precision))
+
+    def in_boxes(self, boxes):
+        """
+        Возвращает точки, попавшие в прямоугольники boxes [(min_lat, max_lat, min_lon, max_lon), ...].
+        """
+        index = SpatialIndexCache().get_index()
+        if index is not None:
+            return self._from_index_rows(index.in_boxes(boxes))
+
         pattern_sql = """
-with select_by_latitudes as
-(
-    select * from public.main_app_geopoint
-    where abs({latitude:.10g} - latitude)<={precision:.30e}
-),
-select_by_longitudes as
+select * from public.main_app_geopoint
+where {candidates};
+"""
+        candidates, params = self._boxes_filter(boxes)
+        return self.raw(pattern_sql.format(candidates=candidates), params)
+
+    def in_boxes_chunks(self, boxes, chunk_size: int):
+        """
+        Генератор списков строк (guid, latitude, longitude) точек в прямоугольниках boxes, не длиннее
+        chunk_size. Без кэша индекса строки читаются из серверного курсора по мере потребления.
+        """
+        index = SpatialIndexCache().get_index()
+        if index is not None:
+            rows = index.in_boxes(boxes)
+            for i in range(0, len(rows), chunk_size):
+                yield [row[:3] for row in rows[i:i + chunk_size]]
+            return
+
+        pattern_sql = """
+select guid, latitude, longitude from public.main_app_geopoint
+where {candidates};
+"""
+        candidates, params = self._boxes_filter(boxes)
+        with connections[self.db].chunked_cursor() as cursor:
+            cursor.execute(pattern_sql.format(candidates=candidates), params)
+            while rows := cursor.fetchmany(chunk_size):
+                yield rows
+
+    def tile_rows(self, bounds):
+        """
+        Возвращает строки (guid, latitude, longitude, subject_id) точек тайла с границами bounds
+        (utils.map_tiles.tile_bounds, полуоткрытые - см. map_tiles.in_tile), упорядоченные по ячейке и guid
+        (порядок не зависит от того, используется ли кэш индекса).
+        """
+        index = SpatialIndexCache().get_index()
+        if index is not None:
+            rows = sorted(index.in_boxes([bounds]), key=lambda row: (row[4], row[0]))
+            return [(guid, latitude, longitude, subject_id) for guid, latitude, longitude, subject_id, *_ in rows
+                    if map_tiles.in_tile(bounds, latitude, longitude)]
+
+        pattern_sql = """
+select guid, latitude, longitude, subject_id from public.main_app_geopoint
+where {candidates}
+order by cell, guid;
+"""
+        # кандидаты выбираются по замкнутому прямоугольнику, точки на верхней и правой границах отбрасываются
+        candidates, params = self._boxes_filter([bounds])
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(pattern_sql.format(candidates=candidates), params)
+            return [row for row in cursor.fetchall() if map_tiles.in_tile(bounds, row[1], row[2])]
+
+    def clusters(self, boxes, level: int, keys):
+        """
+        Агрегирует точки по ячейкам уровня level (utils.geo.Cell) из списка keys, пересекающим
+        прямоугольники boxes. Ячейки учитываются целиком, а не только их части внутри прямоугольников.
+        Возвращает словарь {ключ ячейки: (число точек, средний единичный вектор, {статус карточки: число})}.
+        """
+        points_sql = """
+select cell >> %s as cluster, count(*), avg(x), avg(y), avg(z)
+from public.main_app_geopoint
+where ({cells}) and cell >> %s = any(%s)
+group by cluster;
+"""
+        statuses_sql = """
+select point.cell >> %s as cluster, card.status, count(*)
+from public.main_app_card as card
+join public.main_app_geopoint as point on point.guid = card.coordinates_id
+where ({cells}) and point.cell >> %s = any(%s)
+group by cluster, card.status;
+"""
+        shift = 2 * (geo.Cell.LEVEL - level)
+        cells, cells_params = [], []
+        for min_lat, max_lat, min_lon, max_lon in boxes:
+            for start, end in geo.Cell.covering_ranges(min_lat, max_lat, min_lon, max_lon):
+                # диапазоны расширяются до границ ячеек уровня level, чтобы ячейки учитывались целиком
+                start, _ = geo.Cell.key_range(geo.Cell.parent(start, level), level)
+                _, end = geo.Cell.key_range(geo.Cell.parent(end, level), level)
+                cells.append("{column} between %s and %s")
+                cells_params.extend((start, end))
+
+        cells = " or ".join(cells)
+        params = [shift, *cells_params, shift, list(keys)]
+        clusters = {}
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(points_sql.format(cells=cells.format(column="cell")), params)
+            for key, count, x, y, z in cursor.fetchall():
+                clusters[key] = (count, (x, y, z), {})
+
+            cursor.execute(statuses_sql.format(cells=cells.format(column="point.cell")), params)
+            for key, card_status, count in cursor.fetchall():
+                clusters[key][2][card_status] = count
+
+        return clusters
+
+    def nearest(self, latitude: float, longitude: float, k: int, max_radius: float, subject_id=None,
+                use_cache=True):
+        """
+        Возвращает не более k точек, удаленных от заданной не дальше чем на max_radius метров,
+        в порядке возрастания расстояния. Расстояние по дуге большого круга (в метрах) доступно
+        в атрибуте distance. При равных расстояниях предпочтение отдается точкам субъекта subject_id.
+        """
+        index = SpatialIndexCache().get_index() if use_cache else None
+        if index is not None:
+            return self._nearest_in_index(index, latitude, longitude, k, max_radius, subject_id)
+
+        pattern_sql = """
+with candidates as
 (
-    select * from select_by_latitudes
-    where (case 
-        when abs(latitude) < 90 then abs({longitude:.10g} - longitude) <= {precision:.30e} / cosd(latitude)
-            else true
-        end
-        )
+    select *, (x - %s) * (x - %s) + (y - %s) * (y - %s) + (z - %s) * (z - %s) as chord_square
+    from public.main_app_geopoint
+    where {candidates}
 )
 
-select * from select_by_longitudes;
+select *, 2 * %s * asin(least(sqrt(chord_square) / 2, 1)) as distance from candidates
+where chord_square <= %s
+order by round((%s * sqrt(chord_square))::numeric, 2), subject_id = %s desc
+limit %s;
 """
-        raw_sql = pattern_sql.format(latitude=latitude, longitude=longitude, precision=precision)
-        return self.raw(raw_sql)
+        coord = geo.Coord(latitude=latitude, longitude=longitude)
+        x, y, z = geo.get_unit_vector(coord.degrees.latitude, coord.degrees.longitude)
+        precision = geo.Geometry.get_precision_by_length(length=max_radius)
+        candidates, candidates_params = self._candidates_filter(coord, precision)
+        max_chord = geo.Geometry.get_chord_by_length(length=max_radius) / geo.R
 
-    def _get_min_point_by_distance(self, latitude, longitude, subject_id):
+        params = [x, x, y, y, z, z]
+        params += candidates_params
+        params += [geo.R, max_chord * max_chord, geo.R, subject_id, k]
+
+        raw_sql = pattern_sql.format(candidates=candidates)
+        return self.raw(raw_sql, params)
+
+    def nearest_each(self, coords, max_radius: float):
+        """
+        Для каждой точки coords [(latitude, longitude, subject_id), ...] находит ближайшую существующую точку
+        не дальше max_radius метров (по тем же правилам, что nearest с k=1) или None.
+        Все точки ищутся одним запросом к БД, кэш индекса не используется.
+        """
+        pattern_sql = """
+(
+    select %s as item, *
+    from
+    (
+        select *, (x - %s) * (x - %s) + (y - %s) * (y - %s) + (z - %s) * (z - %s) as chord_square
+        from public.main_app_geopoint
+        where {candidates}
+    ) as candidates
+    where chord_square <= %s
+    order by round((%s * sqrt(chord_square))::numeric, 2), subject_id = %s desc
+    limit 1
+)
+"""
+        precision = geo.Geometry.get_precision_by_length(length=max_radius)
+        max_chord = geo.Geometry.get_chord_by_length(length=max_radius) / geo.R
+        queries, params = [], []
+        for item, (latitude, longitude, subject_id) in enumerate(coords):
+            coord = geo.Coord(latitude=latitude, longitude=longitude)
+            x, y, z = geo.get_unit_vector(coord.degrees.latitude, coord.degrees.longitude)
+            candidates, candidates_params = self._candidates_filter(coord, precision)
+            queries.append(pattern_sql.format(candidates=candidates))
+            params += [item, x, x, y, y, z, z, *candidates_params, max_chord * max_chord, geo.R, subject_id]
+
+        points = [None] * len(queries)
+        if queries:
+            for point in self.raw(" union all ".join(queries), params):
+                point.distance = 2 * geo.R * math.asin(min(math.sqrt(point.chord_square) / 2, 1))
+                points[point.item] = point
+
+        return points
+
+    def _nearest_in_index(self, index, latitude, longitude, k, max_radius, subject_id):
         coord = geo.Coord(latitude=latitude, longitude=longitude)
+        unit_vector = geo.get_unit_vector(coord.degrees.latitude, coord.degrees.longitude)
+        precision = geo.Geometry.get_precision_by_length(length=max_radius)
+        boxes = geo.Geometry.bounding_boxes(coord, precision)
+        max_chord = geo.Geometry.get_chord_by_length(length=max_radius) / geo.R
+
+        points = []
+        for row, chord_square in index.nearest(unit_vector, k, max_chord * max_chord, boxes, subject_id):
+            point = self.model.from_db(self.db, SPATIAL_INDEX_COLUMNS, row)
+            point.distance = 2 * geo.R * math.asin(min(math.sqrt(chord_square) / 2, 1))
+            points.append(point)
+
+        return points
+
+    def _get_min_point_by_distance(self, latitude, longitude, subject_id):
         radius = config.MIN_DISTANCE_BETWEEN_POINTS
-        precision = geo.Geometry.get_precision_by_length(length=radius)
-        points = self.nearby_points(coord.degrees.latitude, coord.degrees.longitude, precision)
+        # привязка к существующей точке выполняется по БД, а не по кэшу, который может отставать
+        points = list(self.nearest(latitude, longitude, 1, radius, subject_id=subject_id, use_cache=False))
         if len(points) > 0:
-            center_point = geo.Point(coord)
-            min_distance = float("inf")
-            min_point_by_distance = points[0]
-
-            iter_coord = geo.Coord(0, 0)
-            iter_point = geo.Point(iter_coord)
-
-            for p in points:
-                iter_coord.update(p.latitude, p.longitude)
-                iter_point.update(iter_coord)
-                distance = round(geo.Geometry.vector_length(center_point, iter_point), 2)
-                if distance < min_distance:
-                    min_distance = distance
-                    min_point_by_distance = p
-                elif distance == min_distance:
-                    if p.pk == subject_id:
-                        min_point_by_distance = p
-
-            return min_point_by_distance
+            return points[0]
 
         return None
 
@@ -118,39 +309,330 @@ select * from select_by_longitudes;
         return point
 
 
+# пространство имен card_uuid карточек, созданных пакетом (см. CardQueryset.get_batch_card_uuid)
+_CARD_BATCH_NAMESPACE = uuid.UUID("7d1f3c1e-5b0a-4f4e-9a52-3f3e0c2b9d61")
+
+# номера изменений карточек и удалений (общая последовательность, создается миграцией)
+_CARD_CHANGE_SEQUENCE = "main_app_card_change_seq"
+_CURRENT_XID_SQL = "pg_current_xact_id()::text::bigint"
+# транзакции с меньшими номерами завершены, а изменения, которые еще будут зафиксированы, получат номер не меньше
+_SNAPSHOT_XMIN_SQL = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+
 class CardQueryset(QuerySet):
+    @staticmethod
+    def get_change_marks(count, using=None):
+        """
+        Отметки изменения count карточек: пары (номер текущей транзакции, следующий номер изменения).
+        Должны получаться в той же транзакции, в которой карточки изменяются.
+        """
+        with connections[using or "default"].cursor() as cursor:
+            cursor.execute(f"select {_CURRENT_XID_SQL}, nextval(%s) from generate_series(1, %s)",
+                           [_CARD_CHANGE_SEQUENCE, count])
+            return cursor.fetchall()
+
+    @staticmethod
+    def get_change_mark(using=None):
+        return CardQueryset.get_change_marks(1, using)[0]
+
+    @staticmethod
+    def _get_change_fields():
+        # значения UPDATE, отмечающие изменение карточки (см. Card.save)
+        return {
+            "change_xid": RawSQL(_CURRENT_XID_SQL, ()),
+            "change_seq": RawSQL("nextval(%s)", (_CARD_CHANGE_SEQUENCE,)),
+            "datetime_modification": timezone.now(),
+        }
+
+    @staticmethod
+    def get_leave_fields(change_xid, change_seq, status=None, inspector_id=None):
+        """
+        Значения UPDATE, отмечающие выход карточки из множеств, которые видны в ленте изменений (см. changes):
+        снятие со статуса "принято" (отметка unpublished_xid, unpublished_seq) и смену проверяющего
+        (previous_inspector). status и inspector_id - новые значения; выражения читают значения полей
+        до изменения, поэтому записываются тем же UPDATE, что и новые значения.
+        """
+        success = models.Card.SuccessChoice.SUCCESS
+        fields = {}
+        if status is not None and status != success:
+            unpublished = Q(status=success)
+            for field_name, value in (("unpublished_xid", change_xid), ("unpublished_seq", change_seq)):
+                fields[field_name] = Case(When(unpublished, then=value), default=F(field_name),
+                                          output_field=BigIntegerField())
+        if inspector_id is not None:
+            reinspected = Q(inspector__isnull=False) & ~Q(inspector=inspector_id)
+            fields["previous_inspector_id"] = Case(When(reinspected, then=F("inspector")),
+                                                   default=F("previous_inspector"))
+        return fields
+
+    def mark_changed(self, **fields):
+        """
+        Одним UPDATE присваивает карточкам запроса новые отметки изменения (и значения fields)
+        и обновляет их строки витрины списка. Для массовых изменений, которые не вызывают Card.save
+        и сигналы моделей. Если fields заданы, версия карточек увеличивается.
+        """
+        if fields:
+            fields.setdefault("version", F("version") + 1)
+
+        with transaction.atomic(using=self.db):
+            # карточки выбираются заранее: fields могут изменить поля, по которым отобран запрос
+            card_uuids = list(self.values_list("card_uuid", flat=True))
+            change_fields = self._get_change_fields()
+            inspector = fields.get("inspector")
+            leave_fields = self.get_leave_fields(change_fields["change_xid"], change_fields["change_seq"],
+                                                 fields.get("status"), getattr(inspector, "pk", inspector))
+            count = QuerySet.update(self.model.objects.filter(card_uuid__in=card_uuids),
+                                    **change_fields, **leave_fields, **fields)
+            models.CardListing.objects.refresh(card_uuids)
+
+        self.cards_changed()
+        return count
+
+    @staticmethod
+    def cards_changed():
+        """
+        Сбрасывает производные от карточек данные после фиксации текущей транзакции.
+        Вызывается сигналами моделей и явно - при массовых изменениях, которые сигналов не вызывают.
+        """
+        transaction.on_commit(caches.card_counts.invalidate)
+        transaction.on_commit(caches.card_responses.invalidate)
+
     def create(self, executor, /, federal_subject, latitude, longitude, photos, **kwargs):
         with transaction.atomic():
             federal_subject_id = card_tools.FEDERAL_SUBJECTS_DICT[federal_subject]
             point = models.GeoPoint.objects.create(latitude, longitude, federal_subject_id)
             card = self.model(card_uuid=uuid.uuid4(), executor=executor, coordinates=point, **kwargs)
             card.save()
-            for photo in photos:
-                models.Photo(path=photo, card_ref=card).save()
+            # фотографии новой карточки не требуют отметки изменения по сигналу Photo (см. card_photo_changed):
+            # карточка отмечена при сохранении, остается обновить ее строку витрины (число фотографий)
+            models.Photo.objects.bulk_create(models.Photo(path=photo, card_ref=card) for photo in photos)
+            models.CardListing.objects.refresh([card.card_uuid])
 
             return card
 
-    def update(self, instance, user, /, **kwargs):
-        property_fields = (
-            "identification_pillar", "monolith_one", "monolith_two", "monolith_three_and_four", "type_of_sign",
-            "sign_height_above_ground_level", "outdoor_sign", "ORP_one", "ORP_two", "trench", "satellite_surveillance"
-        )
+    @staticmethod
+    def get_batch_card_uuid(executor, key):
+        # один и тот же ключ исполнителя всегда дает одну и ту же карточку, поэтому повтор пакета не создает копий
+        return uuid.uuid5(_CARD_BATCH_NAMESPACE, f"{executor.pk}:{key}")
+
+    @staticmethod
+    def _get_batch_points(coords):
+        """
+        Точки для карточек пакета [(latitude, longitude, subject_id), ...] по правилам GeoPoint.objects.create:
+        существующие точки ищутся одним запросом, а новые создаются с учетом уже созданных для пакета.
+        """
+        radius = config.MIN_DISTANCE_BETWEEN_POINTS
+        max_chord = geo.Geometry.get_chord_by_length(length=radius) / geo.R
+        points = models.GeoPoint.objects.nearest_each(coords, radius)
+        created = []
+        for i, (latitude, longitude, subject_id) in enumerate(coords):
+            if points[i] is not None:
+                continue
+
+            unit_vector = geo.get_unit_vector(latitude, longitude)
+            nearby = []
+            for n, point in enumerate(created):
+                chord = math.dist(unit_vector, (point.x, point.y, point.z))
+                if chord <= max_chord:
+                    nearby.append((round(geo.R * chord, 2), point.subject_id != subject_id, n))
+
+            if nearby:
+                points[i] = created[min(nearby)[2]]
+            else:
+                points[i] = models.GeoPoint(guid=uuid.uuid4(), latitude=round(latitude, config.COORD_ROUND_SCALE),
+                                            longitude=round(longitude, config.COORD_ROUND_SCALE),
+                                            subject_id=subject_id)
+                points[i].save()
+                created.append(points[i])
+
+        return points
+
+    def create_batch(self, executor, /, items):
+        """
+        Создает карточки пакета. items - список словарей с аргументами create и ключом идемпотентности key.
+        Возвращает список пар (card_uuid, создана ли карточка) в порядке items: карточки, уже созданные
+        с теми же ключами (повтор пакета), не создаются заново.
+        Карточки и фотографии сохраняются через bulk_create, поэтому сигналы моделей не вызываются,
+        и производные данные (кэши списка и кластеров карты) сбрасываются здесь.
+        """
+        card_uuids = [self.get_batch_card_uuid(executor, item["key"]) for item in items]
         with transaction.atomic():
-            instance.inspector = user
+            # пакеты одного исполнителя обрабатываются по очереди, чтобы одновременный повтор не создал копий
+            with connections[self.db].cursor() as cursor:
+                cursor.execute("select pg_advisory_xact_lock(hashtextextended(%s, 0))", [f"card_batch:{executor.pk}"])
+
+            existing = set(self.filter(card_uuid__in=card_uuids).values_list("card_uuid", flat=True))
+            new_items = [(card_uuid, item) for card_uuid, item in zip(card_uuids, items) if card_uuid not in existing]
+            if not new_items:
+                return [(card_uuid, False) for card_uuid in card_uuids]
+
+            points = self._get_batch_points([
+                (item["latitude"], item["longitude"], card_tools.FEDERAL_SUBJECTS_DICT[item["federal_subject"]])
+                for _, item in new_items
+            ])
+            marks = self.get_change_marks(len(new_items), self.db)
+
+            cards, photos = [], []
+            for (card_uuid, item), point, (change_xid, change_seq) in zip(new_items, points, marks):
+                kwargs = {key: value for key, value in item.items()
+                          if key not in ("key", "federal_subject", "latitude", "longitude", "photos")}
+                card = self.model(card_uuid=card_uuid, executor=executor, coordinates=point, change_xid=change_xid,
+                                  change_seq=change_seq, **kwargs)
+                cards.append(card)
+                photos.extend(models.Photo(path=photo, card_ref=card) for photo in item["photos"])
+
+            self.bulk_create(cards)
+            models.Photo.objects.bulk_create(photos)
+            models.CardListing.objects.refresh([card.card_uuid for card in cards])
+
+            self.cards_changed()
+            cells = [point.cell for point in points]
+            transaction.on_commit(lambda: MapClusterCache().invalidate(cells))
+
+        return [(card_uuid, card_uuid not in existing) for card_uuid in card_uuids]
+
+    def update(self, card_uuid, user, /, version, **kwargs):
+        """
+        Проверка карточки: одним UPDATE записывает только переданные поля kwargs, проверяющего и время проверки.
+        Значения полей состояния пункта (card_tools.property_fields) дополняют JSON в БД (jsonb ||),
+        остальные поля заменяются. Карточка изменяется, только если ее версия равна version - версии,
+        с которой работал проверяющий, поэтому изменения одновременной проверки не перезаписываются.
+        Возвращает новую версию карточки или None, если карточки с такой версией нет.
+        """
+        fields = {}
+        for key, value in kwargs.items():
+            if key in card_tools.property_fields:
+                fields[key] = CombinedExpression(F(key), "||", Value(value, output_field=JSONField()))
+            else:
+                fields[key] = value
+
+        change_fields = self._get_change_fields()
+        leave_fields = self.get_leave_fields(change_fields["change_xid"], change_fields["change_seq"],
+                                             kwargs.get("status"), user.pk)
+        with transaction.atomic(using=self.db):
+            count = QuerySet.update(
+                self.filter(card_uuid=card_uuid, version=version), **change_fields, **leave_fields,
+                version=F("version") + 1, inspector=user, datetime_inspection=datetime.utcnow(), **fields
+            )
+            if not count:
+                return None
+
+            models.CardListing.objects.refresh([card_uuid])
+            if "status" in kwargs:
+                self._clusters_changed([card_uuid])
+
+        self.cards_changed()
+        return version + 1
+
+    def update_batch(self, inspector, /, items):
+        """
+        Проверка пакета карточек в одной транзакции. items - словари с card_uuid (без повторов), status,
+        необязательной версией version (без нее версия не проверяется) и рекомендациями к полям состояния
+        пункта (card_tools.property_fields), которые дополняют JSON карточки.
+        Карточки блокируются, изменяются в памяти и записываются одним bulk_update; витрина, счетчики
+        статистики, кэши списка и кластеров карты обновляются один раз на пакет.
+        Возвращает по каждому элементу items пару (результат, версия): updated - карточка изменена
+        (новая версия), conflict - версия карточки отличается от version (текущая версия),
+        not_found - карточки нет (None).
+        """
+        properties = sorted({key for item in items for key in item if key in card_tools.property_fields})
+        fields = ["status", "inspector", "datetime_inspection", "version", "change_xid", "change_seq",
+                  "datetime_modification", "unpublished_xid", "unpublished_seq", "previous_inspector", *properties]
+        success = self.model.SuccessChoice.SUCCESS
+        results, changed, unpublished = [], [], set()
+        with transaction.atomic(using=self.db):
+            # блокировка в порядке card_uuid, чтобы одновременные пакеты не блокировали друг друга взаимно;
+            # версии сравниваются и JSON дополняется по данным, которые до конца транзакции не изменятся
+            query = (self.filter(card_uuid__in=[item["card_uuid"] for item in items]).select_for_update()
+                     .order_by("card_uuid").only("card_uuid", "version", "status", "inspector", "unpublished_xid",
+                                                 "unpublished_seq", "previous_inspector", *properties))
+            cards = {card.card_uuid: card for card in query}
+
+            datetime_inspection = datetime.utcnow()
+            for item in items:
+                card = cards.get(item["card_uuid"])
+                if card is None:
+                    results.append(("not_found", None))
+                    continue
+
+                version = item.get("version")
+                if version is not None and version != card.version:
+                    results.append(("conflict", card.version))
+                    continue
 
-            for key, value in kwargs.items():
-                if key in property_fields:
-                    instance.__dict__[key].update(value)
+                # выход из видимых множеств ленты изменений (см. get_leave_fields)
+                if card.status == success and item["status"] != success:
+                    unpublished.add(card.card_uuid)
+                if card.inspector_id is not None and card.inspector_id != inspector.pk:
+                    card.previous_inspector_id = card.inspector_id
 
-                else:
-                    instance.__dict__[key] = value
+                card.status = item["status"]
+                card.inspector = inspector
+                card.datetime_inspection = datetime_inspection
+                card.version += 1
+                for field_name in properties:
+                    if field_name in item:
+                        getattr(card, field_name).update(item[field_name])
 
-            instance.datetime_inspection = datetime.utcnow()
-            instance.save()
+                changed.append(card)
+                results.append(("updated", card.version))
 
-            return instance
+            if changed:
+                datetime_modification = timezone.now()
+                for card, (change_xid, change_seq) in zip(changed, self.get_change_marks(len(changed), self.db)):
+                    card.change_xid, card.change_seq = change_xid, change_seq
+                    card.datetime_modification = datetime_modification
+                    if card.card_uuid in unpublished:
+                        card.unpublished_xid, card.unpublished_seq = change_xid, change_seq
 
-    def _create_query_select_cards(self, user, /, only_owned, cards, geopoints, sorted_by, status=None):
+                # bulk_update выполняет QuerySet.update, переопределенный у CardQueryset
+                QuerySet(self.model, using=self.db).bulk_update(changed, fields)
+                card_uuids = [card.card_uuid for card in changed]
+                models.CardListing.objects.refresh(card_uuids)
+                self._clusters_changed(card_uuids)
+
+        if changed:
+            self.cards_changed()
+        return results
+
+    def _clusters_changed(self, card_uuids):
+        # в кластерах карты считаются статусы карточек, поэтому кэш ячеек карточек сбрасывается
+        cells = list(self.model.objects.filter(card_uuid__in=card_uuids)
+                     .values_list("coordinates__cell", flat=True).distinct())
+        transaction.on_commit(lambda: MapClusterCache().invalidate(cells))
+
+    @staticmethod
+    def _get_displayed_columns(displayed_fields, is_staff):
+        # столбцы QuerySet.values(), нужные для вывода полей displayed_fields (см. card_tools.card_row_to_dict)
+        fields = card_tools.owner_fields + card_tools.owner_staff_fields if is_staff else card_tools.owner_fields
+        columns = ["card_uuid"]
+        for field in displayed_fields:
+            if field in card_tools.displayed_Card_fields:
+                columns.append(field)
+            elif field in card_tools.mapper_related_fields:
+                columns.append(card_tools.mapper_related_fields[field])
+            elif field in card_tools.owners:
+                columns.append(f"{field}_id")
+                columns.extend(f"{field}__{name}" for name in fields)
+
+        return columns
+
+    @staticmethod
+    def _get_photos_urls(card_uuids):
+        storage = models.Photo._meta.get_field("path").storage
+        photos = {card_uuid: [] for card_uuid in card_uuids}
+        query = models.Photo.objects.filter(card_ref__in=card_uuids).order_by("pk").values_list("card_ref", "path")
+        for card_uuid, path in query:
+            photos[card_uuid].append(storage.url(path))
+
+        return photos
+
+    def _get_select_filter(self, user, /, only_owned, cards, geopoints, status=None, federal_subject=None,
+                           federal_district=None, properties=None, listing=False):
+        """
+        Условие выборки карточек. listing - условие для витрины списка (CardListing): субъект пункта
+        проверяется по ее столбцу subject_id, а не через таблицу точек.
+        """
         is_staff = user.is_staff
         only_owned_as_inspector = only_owned["as_inspector"]
         only_owned_as_executor = only_owned["as_executor"]
@@ -173,32 +655,581 @@ class CardQueryset(QuerySet):
             filter_ &= Q(card_uuid__in=cards)
 
         if geopoints:
-            filter_ &= Q(coordinates__guid__in=geopoints)
+            filter_ &= Q(coordinates_id__in=geopoints)
+
+        subject_field = "subject_id" if listing else "coordinates__subject_id"
+        if federal_subject is not None:
+            filter_ &= Q(**{subject_field: card_tools.FEDERAL_SUBJECTS_DICT[federal_subject]})
 
-        sorted_fields = []
-        for item in sorted_by:
-            reverse = item["reverse"]
-            field_name = "".join(("-", item["field_name"])) if reverse else item["field_name"]
-            sorted_fields.append(field_name)
+        if federal_district is not None:
+            subjects = models.FederalSubject.objects.filter(district__name=federal_district).values("pk")
+            filter_ &= Q(**{f"{subject_field}__in": subjects})
 
-        query = self.filter(filter_).order_by(*sorted_fields).all()
+        # значения состояния сравниваются выражением (поле -> 'value'), по которому построены индексы Card.Meta
+        for field_name, values in (properties or {}).items():
+            filter_ &= Q(**{f"{field_name}__value__in": values})
+
+        return filter_
+
+    def _create_query_select_cards(self, user, /, only_owned, cards, geopoints, sorted_by, status=None,
+                                   federal_subject=None, federal_district=None, properties=None):
+        filter_ = self._get_select_filter(user, only_owned=only_owned, cards=cards, geopoints=geopoints, status=status,
+                                          federal_subject=federal_subject, federal_district=federal_district,
+                                          properties=properties)
+        query = self.filter(filter_).order_by(*self._get_ordering(self._get_sort_keys(sorted_by))).all()
 
         return query
 
+    @staticmethod
+    def _get_sort_keys(sorted_by):
+        # пары (поле, по убыванию); card_uuid в конце делает порядок однозначным, его направление совпадает
+        # с последним полем, чтобы порядок по одному полю читался индексом (поле, card_uuid) в любую сторону
+        keys = [(item["field_name"], item["reverse"]) for item in sorted_by or ()]
+        return keys + [("card_uuid", keys[-1][1] if keys else False)]
+
+    @staticmethod
+    def _get_ordering(keys, backwards=False):
+        # NULL (datetime_inspection) - в конце при возрастании и в начале при убывании, как по умолчанию в Postgres,
+        # поэтому обратный порядок (backwards) в точности противоположен прямому
+        ordering = []
+        for field_name, reverse in keys:
+            if reverse != backwards:
+                ordering.append(F(field_name).desc(nulls_first=True))
+            else:
+                ordering.append(F(field_name).asc(nulls_last=True))
+
+        return ordering
+
+    def _get_keyset_filter(self, keys, values, backwards=False):
+        """
+        Условие "строка после (values) в порядке _get_ordering(keys, backwards)" для постраничного
+        чтения по ключу: (k1 > v1) or (k1 = v1 and k2 > v2) or ...
+        """
+        filter_ = Q()
+        equal = Q()
+        for (field_name, reverse), value in zip(keys, values):
+            descending = reverse != backwards
+            nullable = self.model._meta.get_field(field_name).null
+            if value is None:
+                after = Q(**{f"{field_name}__isnull": False}) if descending else None
+                same = Q(**{f"{field_name}__isnull": True})
+            else:
+                after = Q(**{f"{field_name}__{'lt' if descending else 'gt'}": value})
+                if nullable and not descending:
+                    after |= Q(**{f"{field_name}__isnull": True})
+                same = Q(**{field_name: value})
+
+            if after is not None:
+                filter_ |= equal & after
+            equal &= same
+
+        # то же условие на первое поле в виде одного диапазона, чтобы индекс читался с позиции курсора,
+        # а не с начала списка (для возрастания с NULL в конце диапазон не выражается)
+        (field_name, reverse), value = keys[0], values[0]
+        descending = reverse != backwards
+        if value is None:
+            bound = None if descending else Q(**{f"{field_name}__isnull": True})
+        elif descending:
+            bound = Q(**{f"{field_name}__lte": value})
+        elif not self.model._meta.get_field(field_name).null:
+            bound = Q(**{f"{field_name}__gte": value})
+        else:
+            bound = None
+
+        if bound is not None:
+            filter_ &= bound
+
+        return filter_
+
+    def _get_cursor_values(self, keys, cursor):
+        fields = (self.model._meta.get_field(field_name) for field_name, _ in keys)
+        return [field.to_python(value) for field, value in zip(fields, cursor["values"])]
+
+    @staticmethod
+    def _get_search_query(search):
+        # search - слова строки поиска (card_tools.search_tokens); запрос читается GIN-индексом card_search_idx
+        return SearchQuery(card_tools.search_tsquery(search), search_type="raw", config="simple")
+
+    def _get_search_rank(self, search):
+        # слова, совпавшие целиком, поднимают карточку выше совпавших только началом ("N-37-12" выше "N-37-125")
+        exact_query = SearchQuery(" | ".join(search), search_type="raw", config="simple")
+        vector = F("search_vector")
+        return SearchRank(vector, self._get_search_query(search)) + SearchRank(vector, exact_query)
+
+    @staticmethod
+    def _get_selection_key(user, only_owned, cards, geopoints, status, search=None, federal_subject=None,
+                           federal_district=None, properties=None):
+        # выборка зависит от пользователя только через фильтры владельца
+        is_staff = user.is_staff
+        as_executor = only_owned["as_executor"]
+        as_inspector = is_staff and only_owned["as_inspector"]
+        return {
+            "is_staff": is_staff,
+            "user": user.pk if as_executor or as_inspector else None,
+            "as_executor": as_executor,
+            "as_inspector": as_inspector,
+            "status": status if as_executor or is_staff else None,
+            "cards": sorted(map(str, cards)),
+            "geopoints": sorted(map(str, geopoints)),
+            "search": search,
+            "federal_subject": federal_subject,
+            "federal_district": federal_district,
+            "properties": {field_name: sorted(values) for field_name, values in (properties or {}).items()},
+        }
+
+    def _get_estimated_count(self, query):
+        # оценка планировщика по статистике таблиц, без выполнения запроса
+        sql, params = query.order_by().values("pk").query.sql_with_params()
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(f"explain (format json) {sql}", params)
+            plan = cursor.fetchone()[0]
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]["Plan Rows"]
+
+    def _get_count(self, query, count_mode, count_key):
+        if count_mode == "none":
+            return None
+
+        if count_mode == "estimated":
+            return self._get_estimated_count(query)
+
+        if count_mode == "cached":
+            count = caches.card_counts.get(count_key)
+            if count is None:
+                count = query.count()
+                caches.card_counts.set(count_key, count, config.CARD_COUNT_CACHE_TIMEOUT_IN_SECONDS)
+            return count
+
+        return query.count()
+
     def card_info(self, user, /, only_owned, cards, geopoints, sorted_by, limit, offset, displayed_fields=None,
-                  status=None):
+                  status=None, cursor=None, count_mode="exact", search=None, federal_subject=None,
+                  federal_district=None, properties=None):
+        """
+        Кэширующая обертка над _card_info. Ключ ответа - нормализованные параметры запроса, признак сотрудника
+        и, только при фильтрах владельца, id пользователя. Кэш сбрасывается при изменении карточек,
+        их фотографий и координат (cards_changed).
+        """
+        key = self._get_selection_key(user, only_owned, cards, geopoints, status, search, federal_subject,
+                                      federal_district, properties)
+        key.update({
+            "sorted_by": [[item["field_name"], item["reverse"]] for item in sorted_by or ()],
+            "limit": limit,
+            "offset": offset,
+            "cursor": cursor,
+            "displayed_fields": sorted(displayed_fields) if displayed_fields is not None else None,
+            "count_mode": count_mode,
+        })
+        result = caches.card_responses.get(key)
+        if result is None:
+            result = self._card_info(user, only_owned=only_owned, cards=cards, geopoints=geopoints,
+                                     sorted_by=sorted_by, limit=limit, offset=offset,
+                                     displayed_fields=displayed_fields, status=status, cursor=cursor,
+                                     count_mode=count_mode, search=search, federal_subject=federal_subject,
+                                     federal_district=federal_district, properties=properties)
+            caches.card_responses.set(key, result, config.CARD_INFO_CACHE_TIMEOUT_IN_SECONDS)
+
+        return result
+
+    def _card_info(self, user, /, only_owned, cards, geopoints, sorted_by, limit, offset, displayed_fields=None,
+                   status=None, cursor=None, count_mode="exact", search=None, federal_subject=None,
+                   federal_district=None, properties=None):
+        """
+        Страница списка карточек. Страница выбирается смещением offset или курсором cursor
+        (содержимое курсора, см. card_tools.decode_cursor): курсор задает позицию условием по полям
+        сортировки и card_uuid, поэтому страница на любой глубине списка стоит столько же, сколько первая.
+        В ответе next_cursor и prev_cursor - курсоры следующей и предыдущей страниц (или None).
+        count_mode определяет общее число карточек count: exact - точное, estimated - оценка планировщика,
+        cached - точное из кэша (сбрасывается при изменении карточек), none - не вычисляется (None).
+        search - слова поиска по индексу, названию пункта и трапециям (card_tools.search_tokens): выбираются
+        карточки, содержащие все слова (как начала слов), в порядке релевантности, затем в порядке sorted_by;
+        страницы поиска выбираются только смещением, курсоры не выдаются.
+        federal_subject, federal_district - субъект и федеральный округ пункта, properties - допустимые значения
+        состояния пункта {поле: [значения value]} (поля card_tools.property_fields).
+        """
+        if displayed_fields is None:
+            displayed_fields = card_tools.displayed_fields
+
+        keys = self._get_sort_keys(sorted_by)
+        selection = {"only_owned": only_owned, "cards": cards, "geopoints": geopoints, "status": status,
+                     "federal_subject": federal_subject, "federal_district": federal_district,
+                     "properties": properties}
+        # если все выводимые поля и фильтры есть в витрине списка, карточки читаются из нее без соединений таблиц
+        columns = None
+        if not properties:
+            columns = models.CardListing.objects.get_columns(displayed_fields, user.is_staff)
+        if search:
+            query = self._create_query_select_cards(user, sorted_by=sorted_by, **selection)
+            query = query.filter(search_vector=self._get_search_query(search)).annotate(
+                rank=self._get_search_rank(search)
+            ).order_by(F("rank").desc(), *self._get_ordering(keys))
+            columns = {column: column for column in self._get_displayed_columns(displayed_fields, user.is_staff)}
+        elif columns is not None:
+            filter_ = self._get_select_filter(user, listing=True, **selection)
+            query = models.CardListing.objects.filter(filter_).order_by(*self._get_ordering(keys))
+        else:
+            query = self._create_query_select_cards(user, sorted_by=sorted_by, **selection)
+            columns = {column: column for column in self._get_displayed_columns(displayed_fields, user.is_staff)}
+
+        count_key = self._get_selection_key(user, only_owned, cards, geopoints, status, search, federal_subject,
+                                            federal_district, properties)
+        count_rows = self._get_count(query, count_mode, count_key)
+        backwards = False
+        if cursor is not None:
+            backwards = cursor["backwards"]
+            keyset_filter = self._get_keyset_filter(keys, self._get_cursor_values(keys, cursor), backwards)
+            query = query.filter(keyset_filter).order_by(*self._get_ordering(keys, backwards))
+
+        # загружаются только выводимые столбцы (со связанными таблицами - одним запросом),
+        # фотографии всей страницы - вторым запросом; лишняя строка показывает, есть ли следующая страница
+        for field_name, _ in keys:
+            columns.setdefault(field_name, field_name)
+        names = list(columns)
+        rows = query.values_list(*columns.values())[offset:(offset + limit + 1)]
+        rows = [dict(zip(names, values)) for values in rows]
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+
+        photos = None
+        if "photos" in displayed_fields:
+            photos = self._get_photos_urls([row["card_uuid"] for row in rows])
+
+        sort_spec = keys[:-1]
+        next_cursor = prev_cursor = None
+        # позиция в результатах поиска зависит от релевантности, которую курсор не хранит
+        if rows and not search:
+            if has_more or backwards:
+                next_cursor = card_tools.encode_cursor(sort_spec, [rows[-1][field_name] for field_name, _ in keys])
+            if has_more if backwards else cursor is not None or offset > 0:
+                prev_cursor = card_tools.encode_cursor(sort_spec, [rows[0][field_name] for field_name, _ in keys],
+                                                       backwards=True)
 
-        query = self._create_query_select_cards(user, only_owned=only_owned, cards=cards,
-                                                geopoints=geopoints, sorted_by=sorted_by,
-                                                status=status)
-        count_rows = query.count()
-        query_set = query[offset:(offset + limit)]
         result_list = []
-        result = {"cards": result_list, "count": count_rows}
+        result = {"cards": result_list, "count": count_rows, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
 
-        card_to_dict = card_tools.card_to_dict
+        card_row_to_dict = card_tools.card_row_to_dict
+        is_staff = user.is_staff
 
-        for card in query_set:
-            result_list.append(card_to_dict(user, card, displayed_fields))
+        for row in rows:
+            result_list.append(card_row_to_dict(row, displayed_fields, is_staff, photos))
 
         return result
+
+    def export(self, status=None, federal_subject=None, modified_from=None, modified_to=None,
+               chunk_size=config.CARD_EXPORT_CHUNK_SIZE):
+        """
+        Выгрузка карточек со всеми полями (правила вывода - как у card_row_to_dict для сотрудника).
+        Генератор списков из не более чем chunk_size карточек. Карточки читаются одним запросом,
+        упорядоченным по card_uuid, через курсор на стороне сервера, а фотографии - одним запросом
+        на каждую порцию, поэтому расход памяти не зависит от числа карточек.
+        """
+        filter_ = Q()
+        if status is not None:
+            filter_ &= Q(status=status)
+        if federal_subject is not None:
+            filter_ &= Q(coordinates__subject_id=card_tools.FEDERAL_SUBJECTS_DICT[federal_subject])
+        if modified_from is not None:
+            filter_ &= Q(datetime_modification__gte=modified_from)
+        if modified_to is not None:
+            filter_ &= Q(datetime_modification__lt=modified_to)
+
+        displayed_fields = card_tools.displayed_fields
+        columns = self._get_displayed_columns(displayed_fields, True)
+        rows = self.filter(filter_).order_by("card_uuid").values(*columns).iterator(chunk_size=chunk_size)
+        card_row_to_dict = card_tools.card_row_to_dict
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            photos = self._get_photos_urls([row["card_uuid"] for row in chunk])
+            yield [card_row_to_dict(row, displayed_fields, True, photos) for row in chunk]
+
+    def changes(self, user, /, only_owned, since, limit, displayed_fields=None):
+        """
+        Изменения карточек после отметки since (пара (транзакция, номер изменения) или None - с начала).
+        Возвращает измененные карточки, видимые пользователю (как в card_info), и card_uuid удаленных
+        или переставших быть видимыми карточек, в порядке отметок, не более limit всего.
+        Удаленные карточки выдаются по их состоянию на момент удаления (CardTombstone) тем же пользователям.
+        Переставшими быть видимыми считаются только карточки, снятые со статуса "принято" после since
+        (в списке принятых карточек) и перешедшие от сотрудника к другому проверяющему (в списке проверенных
+        сотрудником); остальные невидимые пользователю карточки в ленту не попадают.
+        Выдаются только изменения завершенных транзакций: изменение, зафиксированное позже, получит отметку
+        больше выданной watermark, поэтому клиент, передающий ее в следующий раз, ничего не пропустит.
+        """
+        if displayed_fields is None:
+            displayed_fields = card_tools.displayed_fields
+
+        after = Q(change_xid__lt=RawSQL(_SNAPSHOT_XMIN_SQL, ()))
+        if since is not None:
+            xid, seq = since
+            # граница по первому полю индекса отдельно от OR, чтобы индекс читался с позиции since
+            after &= Q(change_xid__gte=xid) & (Q(change_xid__gt=xid) | Q(change_xid=xid, change_seq__gt=seq))
+        order = ("change_xid", "change_seq")
+
+        filter_ = self._get_select_filter(user, only_owned=only_owned, cards=[], geopoints=[])
+        visible = ExpressionWrapper(filter_, output_field=BooleanField()) if filter_ else Value(True)
+        query = self.filter(after)
+        tombstones = models.CardTombstone.objects.filter(after)
+        if filter_:
+            # без since клиент еще ничего не получал, и выход из видимого множества ему не важен
+            left = Q(pk__in=[])
+            if since is not None:
+                if not user.is_staff and not only_owned["as_executor"]:
+                    left |= Q(unpublished_xid__gt=xid) | Q(unpublished_xid=xid, unpublished_seq__gt=seq)
+                if user.is_staff and only_owned["as_inspector"]:
+                    left |= Q(previous_inspector=user)
+            # удаленная карточка выдается тем же пользователям, что и измененная (по ее состоянию при удалении)
+            query = query.filter(filter_ | left)
+            tombstones = tombstones.filter(filter_ | left)
+
+        columns = self._get_displayed_columns(displayed_fields, user.is_staff)
+        rows = list(query.annotate(visible=visible).order_by(*order)
+                    .values(*columns, *order, "visible")[:limit + 1])
+        tombstones = list(tombstones.order_by(*order).values("card_uuid", *order)[:limit + 1])
+
+        changed = sorted(rows + tombstones, key=lambda row: (row["change_xid"], row["change_seq"]))
+        has_more = len(changed) > limit
+        changed = changed[:limit]
+
+        visible_rows = [row for row in changed if row.get("visible")]
+        photos = None
+        if "photos" in displayed_fields:
+            photos = self._get_photos_urls([row["card_uuid"] for row in visible_rows])
+
+        watermark = (changed[-1]["change_xid"], changed[-1]["change_seq"]) if changed else since
+        card_row_to_dict = card_tools.card_row_to_dict
+        return {
+            "cards": [card_row_to_dict(row, displayed_fields, user.is_staff, photos) for row in visible_rows],
+            "deleted": [row["card_uuid"] for row in changed if not row.get("visible")],
+            "watermark": None if watermark is None else card_tools.encode_watermark(watermark),
+            "has_more": has_more,
+        }
+
+
+class CardListingQuerySet(QuerySet):
+    # столбцы витрины (кроме card_uuid) и выражения над карточкой и связанными таблицами, из которых они строятся
+    _SOURCE_COLUMNS = {
+        "status": "card.status",
+        "execute_date": "card.execute_date",
+        "datetime_creation": "card.datetime_creation",
+        "datetime_inspection": "card.datetime_inspection",
+        "coordinates_id": "card.coordinates_id",
+        "latitude": "point.latitude",
+        "longitude": "point.longitude",
+        "subject_id": "point.subject_id",
+        "federal_subject": "subject.name",
+        "federal_district": "district.name",
+        "executor_id": "card.executor_id",
+        "executor_first_name": "executor.first_name",
+        "executor_second_name": "executor.second_name",
+        "executor_third_name": "executor.third_name",
+        "executor_email": "executor.email",
+        "inspector_id": "card.inspector_id",
+        "inspector_first_name": "inspector.first_name",
+        "inspector_second_name": "inspector.second_name",
+        "inspector_third_name": "inspector.third_name",
+        "inspector_email": "inspector.email",
+        "photos_count":
+            "(select count(*) from public.main_app_photo as photo where photo.card_ref_id = card.card_uuid)",
+        "version": "card.version",
+    }
+    _SOURCE_SQL = """
+select card.card_uuid, {columns}
+from public.main_app_card as card
+join public.main_app_geopoint as point on point.guid = card.coordinates_id
+join public.main_app_federalsubject as subject on subject.id = point.subject_id
+join public.main_app_federaldistrict as district on district.id = subject.district_id
+join public.main_app_user as executor on executor.id = card.executor_id
+left join public.main_app_user as inspector on inspector.id = card.inspector_id
+{where}
+"""
+    # поля карточки, которые выводятся из витрины под теми же именами
+    _CARD_FIELDS = ("status", "execute_date", "datetime_creation", "datetime_inspection", "version")
+
+    @staticmethod
+    def get_columns(displayed_fields, is_staff):
+        """
+        Столбцы витрины для вывода полей displayed_fields: словарь {ключ строки, как в
+        CardQueryset._get_displayed_columns: столбец витрины}. None, если не все поля есть в витрине.
+        """
+        fields = card_tools.owner_fields + card_tools.owner_staff_fields if is_staff else card_tools.owner_fields
+        columns = {"card_uuid": "card_uuid"}
+        for field in displayed_fields:
+            if field in CardListingQuerySet._CARD_FIELDS:
+                columns[field] = field
+            elif field in card_tools.mapper_related_fields:
+                columns[card_tools.mapper_related_fields[field]] = field
+            elif field in card_tools.owners:
+                columns[f"{field}_id"] = f"{field}_id"
+                columns.update((f"{field}__{name}", f"{field}_{name}") for name in fields)
+            else:
+                return None
+
+        return columns
+
+    def _get_source_sql(self, card_uuids):
+        columns = ", ".join(f"{source} as {column}" for column, source in self._SOURCE_COLUMNS.items())
+        where = "" if card_uuids is None else "where card.card_uuid = any(%s)"
+        return self._SOURCE_SQL.format(columns=columns, where=where)
+
+    def refresh(self, card_uuids=None):
+        """
+        Перестраивает строки витрины карточек card_uuids (всех карточек, если None) по текущим данным:
+        строки существующих карточек вставляются или обновляются, строки удаленных - удаляются.
+        Тем же запросом счетчики статистики (CardStatistics) изменяются на разность старых и новых строк.
+        Вызывается в транзакции изменения, поэтому витрина и статистика согласованы с карточками в каждой
+        зафиксированной транзакции.
+        """
+        if card_uuids is not None:
+            card_uuids = list(card_uuids)
+            if not card_uuids:
+                return
+
+        columns = list(self._SOURCE_COLUMNS)
+        statistics_columns = ", ".join(CardStatisticsQuerySet.LISTING_COLUMNS)
+        # старые строки блокируются: при одновременном обновлении карточки разность считается
+        # от строки, записанной предыдущей транзакцией, а не от снимка начала запроса
+        refresh_sql = """
+with previous as (
+    select {statistics_columns} from public.main_app_cardlisting as listing
+    {where}
+    for update
+),
+upserted as (
+    insert into public.main_app_cardlisting (card_uuid, {columns})
+    {source}
+    on conflict (card_uuid) do update set {updates}
+    returning {statistics_columns}
+),
+deleted as (
+    delete from public.main_app_cardlisting as listing
+    where {delete_where} not exists (select from public.main_app_card as card where card.card_uuid = listing.card_uuid)
+)
+{statistics}
+""".format(statistics_columns=statistics_columns, columns=", ".join(columns),
+           source=self._get_source_sql(card_uuids),
+           updates=", ".join(f"{column} = excluded.{column}" for column in columns),
+           where="" if card_uuids is None else "where listing.card_uuid = any(%s)",
+           delete_where="" if card_uuids is None else "listing.card_uuid = any(%s) and",
+           statistics=CardStatisticsQuerySet.get_apply_sql("previous", "upserted"))
+        params = [] if card_uuids is None else [card_uuids] * 3
+        with connections[self.db].cursor() as cursor:
+            if card_uuids is not None:
+                # строки витрины строятся по снимку начала запроса: карточки, которые изменяет другая
+                # транзакция, нужно дождаться, иначе их строки будут построены по старым данным
+                cursor.execute("""
+select from public.main_app_card where card_uuid = any(%s) order by card_uuid for share
+""", [card_uuids])
+            cursor.execute(refresh_sql, params)
+
+    def get_differences(self):
+        """
+        Число карточек, строки витрины которых не совпадают с данными карточек (лишние, отсутствующие
+        или устаревшие строки).
+        """
+        columns = ", ".join(["card_uuid", *self._SOURCE_COLUMNS])
+        check_sql = """
+with source as ({source}),
+listing as (select {columns} from public.main_app_cardlisting)
+select count(distinct card_uuid) from
+(
+    (select * from source except select * from listing)
+    union all
+    (select * from listing except select * from source)
+) as differences;
+""".format(source=self._get_source_sql(None), columns=columns)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(check_sql)
+            return cursor.fetchone()[0]
+
+
+class CardStatisticsQuerySet(QuerySet):
+    # столбцы строки витрины, от которых зависит группа статистики
+    LISTING_COLUMNS = ("federal_subject", "federal_district", "status", "datetime_creation")
+    _GROUP_SQL = """
+select federal_subject, federal_district, status, date_trunc('month', datetime_creation)::date as month,
+       count(*) as cards_count
+from ({rows}) as rows
+group by 1, 2, 3, 4
+"""
+
+    @staticmethod
+    def get_apply_sql(previous, current):
+        """
+        Запрос, изменяющий счетчики на разность строк витрины: previous - строки до изменения, current - после
+        (имена таблиц или CTE со столбцами LISTING_COLUMNS).
+        """
+        return """
+insert into public.main_app_cardstatistics (federal_subject, federal_district, status, month, cards_count)
+select federal_subject, federal_district, status, date_trunc('month', datetime_creation)::date, sum(delta)
+from (
+    select {columns}, -1 as delta from {previous}
+    union all
+    select {columns}, 1 as delta from {current}
+) as changes
+group by 1, 2, 3, 4
+having sum(delta) <> 0
+on conflict (federal_subject, federal_district, status, month)
+do update set cards_count = main_app_cardstatistics.cards_count + excluded.cards_count
+""".format(columns=", ".join(CardStatisticsQuerySet.LISTING_COLUMNS), previous=previous, current=current)
+
+    def _get_source_sql(self):
+        return self._GROUP_SQL.format(rows=models.CardListing.objects.all()._get_source_sql(None))
+
+    def rebuild(self):
+        """
+        Пересчитывает счетчики по данным карточек. Таблица счетчиков блокируется до конца транзакции:
+        изменения карточек, начатые раньше, завершаются до пересчета, начатые позже - ждут его.
+        """
+        rebuild_sql = """
+insert into public.main_app_cardstatistics (federal_subject, federal_district, status, month, cards_count)
+{source}
+""".format(source=self._get_source_sql())
+        with transaction.atomic(using=self.db), connections[self.db].cursor() as cursor:
+            cursor.execute("lock table public.main_app_cardstatistics in exclusive mode")
+            cursor.execute("delete from public.main_app_cardstatistics")
+            cursor.execute(rebuild_sql)
+
+    def get_differences(self):
+        """
+        Число групп, счетчики которых не совпадают с данными карточек.
+        """
+        columns = ", ".join((*card_tools.statistics_fields, "cards_count"))
+        check_sql = """
+with source as ({source}),
+statistics as (select {columns} from public.main_app_cardstatistics where cards_count <> 0)
+select count(distinct (federal_subject, federal_district, status, month)) from
+(
+    (select * from source except select * from statistics)
+    union all
+    (select * from statistics except select * from source)
+) as differences;
+""".format(source=self._get_source_sql(), columns=columns)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(check_sql)
+            return cursor.fetchone()[0]
+
+    def summary(self, group_by, status=None, federal_subject=None, federal_district=None, month_from=None,
+                month_to=None):
+        """
+        Число карточек в группах по полям group_by (из card_tools.statistics_fields). Читаются только счетчики, поэтому
+        время ответа зависит от числа групп, а не от числа карточек.
+        """
+        filter_ = Q(cards_count__gt=0)
+        if status is not None:
+            filter_ &= Q(status=status)
+        if federal_subject is not None:
+            filter_ &= Q(federal_subject=federal_subject)
+        if federal_district is not None:
+            filter_ &= Q(federal_district=federal_district)
+        if month_from is not None:
+            filter_ &= Q(month__gte=month_from.replace(day=1))
+        if month_to is not None:
+            filter_ &= Q(month__lte=month_to)
+
+        query = self.filter(filter_)
+        if not group_by:
+            return [query.aggregate(count=Coalesce(Sum("cards_count"), 0))]
+
+        return list(query.values(*group_by).annotate(count=Sum("cards_count")).order_by(*group_by))
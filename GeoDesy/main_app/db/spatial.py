@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+import psycopg
+from django.db import connection, close_old_connections
+import config
+from main_app import models
+from utils.algorithms import Singleton
+from utils.spatial_index import SpatialIndex, SPATIAL_INDEX_COLUMNS, read_snapshot
+from utils.threads import CustomThreadExecutor
+
+__all__ = ("SpatialIndexCache",)
+
+
+class SpatialIndexCache(Singleton):
+    """
+    Пространственный индекс GeoPoint в памяти процесса (включается настройкой SPATIAL_INDEX_ENABLED).
+
+    Индекс строится лениво при первом обращении, обновляется по сигналам post_save/post_delete
+    своего процесса и по уведомлениям Postgres (LISTEN/NOTIFY) от остальных процессов.
+    При потере соединения слушателя индекс сбрасывается и строится заново при следующем обращении.
+
+    Если задан файл снимка SPATIAL_INDEX_SNAPSHOT (см. команду spatial_snapshot), основная часть индекса
+    отображается из него в память только для чтения и разделяется всеми процессами, а в память процесса
+    загружаются лишь точки, измененные после создания снимка; удаленные после его создания точки скрываются
+    по записям GeoPointTombstone.
+    Замена файла снимка подхватывается при следующем обращении.
+    """
+    _RECONNECT_DELAY_IN_SECONDS = 5
+
+    def __new__(cls, *args, **kwargs):
+        obj = super().__new__(cls)
+        if not hasattr(obj, "_lock"):
+            obj._init_state()
+        return obj
+
+    def _init_state(self):
+        self._lock = threading.RLock()
+        self._index = None
+        self._token = uuid.uuid4().hex
+        self._listener_started = False
+        self._listener_alive = False
+        self._generation = 0
+        self._hits = 0
+        self._builds = 0
+        self._notifications = 0
+        self._built_at = None
+        self._last_change_at = None
+        self._last_notification_at = None
+        self._snapshot_mtime = None
+        self._snapshot_created_at = None
+
+    @property
+    def enabled(self):
+        return config.SPATIAL_INDEX_ENABLED
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get_index(self):
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            if self._index is not None and self._snapshot_replaced():
+                self._index = None
+            if self._index is None:
+                self._index = self._load()
+                self._generation += 1
+                self._builds += 1
+                self._built_at = datetime.utcnow()
+            self._hits += 1
+            index = self._index
+
+        self._start_listener()
+        return index
+
+    @staticmethod
+    def _get_snapshot_mtime():
+        path = config.SPATIAL_INDEX_SNAPSHOT
+        if path and os.path.exists(path):
+            return os.stat(path).st_mtime_ns
+        return None
+
+    def _snapshot_replaced(self):
+        return self._get_snapshot_mtime() != self._snapshot_mtime
+
+    def _load(self):
+        self._snapshot_mtime = self._get_snapshot_mtime()
+        if self._snapshot_mtime is None:
+            self._snapshot_created_at = None
+            rows = models.GeoPoint.objects.order_by().values_list(*SPATIAL_INDEX_COLUMNS)
+            return SpatialIndex.from_rows(rows.iterator(chunk_size=10000))
+
+        base, base_guids, self._snapshot_created_at = read_snapshot(config.SPATIAL_INDEX_SNAPSHOT)
+        index = SpatialIndex(base, base_guids)
+        modified_since = self._snapshot_created_at - timedelta(
+            seconds=config.SPATIAL_INDEX_SNAPSHOT_MARGIN_IN_SECONDS)
+        # точки, удаленные после создания снимка, остаются в нем; удаленные, а затем созданные заново
+        # с тем же guid точки попадают и в delta, поэтому она применяется после удалений
+        deleted = models.GeoPointTombstone.objects.filter(datetime_deletion__gte=modified_since)
+        for guid in deleted.values_list("guid", flat=True):
+            index.remove(guid)
+
+        delta = models.GeoPoint.objects.filter(datetime_modification__gte=modified_since).order_by()
+        for row in delta.values_list(*SPATIAL_INDEX_COLUMNS):
+            index.upsert(row)
+
+        return index
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+            self._generation += 1
+
+    def _apply(self, change):
+        with self._lock:
+            if self._index is None:
+                return
+
+            change(self._index)
+            # основную часть, отображенную из снимка, не копируем в память процесса
+            if not self._index.is_mapped and self._index.overlay_size >= config.SPATIAL_INDEX_COMPACT_THRESHOLD:
+                self._index.compact()
+            self._generation += 1
+            self._last_change_at = datetime.utcnow()
+
+    def apply_saved(self, row):
+        self._apply(lambda index: index.upsert(row))
+
+    def apply_deleted(self, guid):
+        self._apply(lambda index: index.remove(guid))
+
+    def notify(self, operation, guid):
+        payload = ":".join((operation, str(guid), self._token))
+        with connection.cursor() as cursor:
+            cursor.execute("select pg_notify(%s, %s)", [config.SPATIAL_INDEX_CHANNEL, payload])
+
+    def _handle_notification(self, payload):
+        operation, guid, token = payload.split(":")
+        self._notifications += 1
+        self._last_notification_at = datetime.utcnow()
+        if token == self._token:
+            return
+
+        guid = uuid.UUID(guid)
+        if operation == "save":
+            close_old_connections()
+            row = models.GeoPoint.objects.filter(guid=guid).values_list(*SPATIAL_INDEX_COLUMNS).first()
+            if row is not None:
+                self.apply_saved(row)
+                return
+
+        self.apply_deleted(guid)
+
+    def _listen(self):
+        while True:
+            try:
+                params = connection.get_connection_params()
+                with psycopg.connect(**params, autocommit=True) as listener:
+                    listener.execute(f"listen {config.SPATIAL_INDEX_CHANNEL}")
+                    self._listener_alive = True
+                    # изменения, произошедшие до подписки, могли быть пропущены
+                    self.invalidate()
+                    for notification in listener.notifies():
+                        self._handle_notification(notification.payload)
+
+            except Exception:
+                self._listener_alive = False
+                self.invalidate()
+                time.sleep(self._RECONNECT_DELAY_IN_SECONDS)
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener_started:
+                return
+            self._listener_started = True
+
+        executor = CustomThreadExecutor(thread_name_prefix=self.__class__.__name__)
+        executor.submit(self._listen)
+
+    def stats(self):
+        index = self._index
+        return {
+            "enabled": self.enabled,
+            "built": index is not None,
+            "generation": self._generation,
+            "size": len(index) if index is not None else 0,
+            "overlay_size": index.overlay_size if index is not None else 0,
+            "mapped": index is not None and index.is_mapped,
+            "snapshot_created_at": self._snapshot_created_at,
+            "hits": self._hits,
+            "builds": self._builds,
+            "notifications": self._notifications,
+            "listener_alive": self._listener_alive,
+            "built_at": self._built_at,
+            "last_change_at": self._last_change_at,
+            "last_notification_at": self._last_notification_at,
+        }
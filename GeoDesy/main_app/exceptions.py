@@ -4,7 +4,8 @@ from rest_framework.exceptions import ValidationError as APIValidationError
 
 __all__ = (
     "BadEnterAPIError", "NotFoundAPIError", "PermissionDeniedAPIError", "AuthenticationFailedAPIError",
-    "FailedOperationAPIError", "ValidateError", "InvalidTokenError", "JsonSerializeError", "JsonDeserializeError"
+    "FailedOperationAPIError", "ConflictAPIError", "ValidateError", "InvalidTokenError", "JsonSerializeError",
+    "JsonDeserializeError"
 )
 
 
@@ -38,6 +39,12 @@ class FailedOperationAPIError(APIException):
     default_code = 'failed_operation'
 
 
+class ConflictAPIError(APIException):
+    status_code = 409
+    default_detail = 'Данные были изменены другим запросом'
+    default_code = 'conflict'
+
+
 class ValidateError(Exception):
 
     def __new__(cls, msg):
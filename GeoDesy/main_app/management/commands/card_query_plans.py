@@ -0,0 +1,186 @@
+import json
+import random
+import uuid
+from datetime import date, datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from main_app.models import Card, CardListing, FederalSubject, GeoPoint, User
+from utils import card_tools
+from utils.geo import Cell, get_unit_vector
+
+__all__ = ("Command", "get_scenario_queries")
+
+CREATED = {"field_name": "datetime_creation", "reverse": False}
+CREATED_DESC = {"field_name": "datetime_creation", "reverse": True}
+INSPECTED = {"field_name": "datetime_inspection", "reverse": False}
+INSPECTED_DESC = {"field_name": "datetime_inspection", "reverse": True}
+
+# (описание, сотрудник, only_owned, status, sorted_by[, состояние пункта])
+SCENARIOS = (
+    ("Общий список принятых, по созданию", False, {"as_executor": False, "as_inspector": False}, None, [CREATED]),
+    ("Общий список принятых, по проверке (убыв.)", False, {"as_executor": False, "as_inspector": False}, None,
+     [INSPECTED_DESC]),
+    ("Свои карточки исполнителя, по созданию (убыв.)", False, {"as_executor": True, "as_inspector": False}, None,
+     [CREATED_DESC]),
+    ("Сотрудник: все карточки, по созданию", True, {"as_executor": False, "as_inspector": False}, None, [CREATED]),
+    ("Сотрудник: все карточки, по проверке", True, {"as_executor": False, "as_inspector": False}, None, [INSPECTED]),
+    ("Сотрудник: по статусу, по проверке (убыв.)", True, {"as_executor": False, "as_inspector": False}, "pending",
+     [INSPECTED_DESC]),
+    ("Сотрудник: проверенные им, по проверке", True, {"as_executor": False, "as_inspector": True}, None,
+     [INSPECTED]),
+    ("Общий список принятых, по состоянию монолита", False, {"as_executor": False, "as_inspector": False}, None,
+     [CREATED], {"monolith_one": ["unsaved"]}),
+    ("Сотрудник: по состоянию окопки и знака", True, {"as_executor": False, "as_inspector": False}, None,
+     [INSPECTED], {"trench": ["unreadable"], "outdoor_sign": ["unsaved"]}),
+)
+
+# тестовый набор данных: число карточек, исполнителей и сотрудников, начальное значение генератора
+SEED_CARDS = 5000
+SEED_EXECUTORS = 50
+SEED_INSPECTORS = 5
+SEED = 0
+
+# допустимые значения состояния пункта по полям (как в фильтре properties списка карточек)
+_PROPERTY_CHOICES = {
+    "identification_pillar": card_tools.DetectedPropertyChoice.choices,
+    "type_of_sign": card_tools.TypeSignChoice.choices,
+    "monolith_one": card_tools.SavingPropertyChoice.choices,
+    "monolith_two": card_tools.CoveringPropertyChoice.choices,
+    "monolith_three_and_four": card_tools.CoveringPropertyChoice.choices,
+    "outdoor_sign": card_tools.SavingPropertyChoice.choices,
+    "ORP_one": card_tools.SavingPropertyChoice.choices,
+    "ORP_two": card_tools.SavingPropertyChoice.choices,
+    "trench": card_tools.ReadingPropertyChoice.choices,
+    "satellite_surveillance": card_tools.PossiblePropertyChoice.choices,
+}
+
+
+def _find_seq_scans(plan, table):
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") == table:
+            return True
+        nodes.extend(node.get("Plans", ()))
+    return False
+
+
+def _explain(sql, params):
+    # выполняется в транзакции: set local действует до ее завершения
+    with connection.cursor() as cursor:
+        # последовательное сканирование остается в плане, только если подходящего индекса нет
+        cursor.execute("set local enable_seqscan = off")
+        cursor.execute(f"explain (format json) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def _seed(cards_count):
+    """
+    Создает одинаковый при каждом запуске набор пользователей, точек и карточек (со строками витрины).
+    Вызывается в транзакции, которая затем откатывается.
+    """
+    rnd = random.Random(SEED)
+    token = uuid.UUID(int=rnd.getrandbits(128)).hex[:8]
+
+    def make_user(i, is_staff):
+        return User(email=f"plans-{token}-{i}@example.com", first_name="x", second_name="x", third_name="x",
+                    sex=User.Sex.UNKNOWN, is_staff=is_staff)
+
+    executors = User.objects.bulk_create(make_user(i, False) for i in range(SEED_EXECUTORS))
+    inspectors = User.objects.bulk_create(make_user(SEED_EXECUTORS + i, True) for i in range(SEED_INSPECTORS))
+    subject_ids = list(FederalSubject.objects.order_by("pk").values_list("pk", flat=True))
+
+    points, cards = [], []
+    statuses = [value for value, _ in Card.StatusChoice.choices]
+    started = datetime(2024, 1, 1)
+    marks = Card.objects.get_change_marks(cards_count)
+    for i, (change_xid, change_seq) in enumerate(marks):
+        # точки в стороне от реальных (южное полушарие), чтобы не нарушить уникальность координат
+        latitude, longitude = -80 + rnd.random() * 10, rnd.uniform(-180, 180)
+        x, y, z = get_unit_vector(latitude, longitude)
+        point = GeoPoint(guid=uuid.UUID(int=rnd.getrandbits(128)), latitude=latitude, longitude=longitude,
+                         subject_id=rnd.choice(subject_ids), cell=Cell.key(latitude, longitude), x=x, y=y, z=z)
+        points.append(point)
+
+        status = rnd.choice(statuses)
+        inspected = status != Card.SendingChoice.SENDING and rnd.random() < 0.9
+        properties = {field_name: {"value": rnd.choice(choices)[0], "comment": None, "recommendation": None}
+                      for field_name, choices in _PROPERTY_CHOICES.items()}
+        properties["type_of_sign"] = {"value": properties["type_of_sign"]["value"], "properties": {}}
+        cards.append(Card(
+            card_uuid=uuid.UUID(int=rnd.getrandbits(128)), status=status,
+            execute_date=date(2024, 1, 1) + timedelta(days=i % 365), executor=rnd.choice(executors),
+            inspector=rnd.choice(inspectors) if inspected else None,
+            datetime_inspection=started + timedelta(minutes=i) if inspected else None,
+            coordinates=point, sign_height_above_ground_level=1, sign_height=1, point_index=f"P-{i}",
+            change_xid=change_xid, change_seq=change_seq, **properties
+        ))
+
+    GeoPoint.objects.bulk_create(points)
+    Card.objects.bulk_create(cards)
+    CardListing.objects.refresh([card.card_uuid for card in cards])
+    with connection.cursor() as cursor:
+        cursor.execute(f"analyze {Card._meta.db_table}, {CardListing._meta.db_table}")
+
+    return executors[0], inspectors[0]
+
+
+def get_scenario_queries(executor, inspector, limit):
+    """
+    Запросы страниц списка карточек по сценариям SCENARIOS для пользователей тестового набора:
+    тройки (описание, запрос, таблица, которую запрос не должен читать целиком).
+    """
+    card_query = Card.objects.all()
+    for description, is_staff, only_owned, status, sorted_by, *properties in SCENARIOS:
+        # владелец - пользователь тестового набора, чтобы фильтры по нему отбирали его карточки
+        user = inspector if is_staff else executor
+        properties = properties[0] if properties else None
+        query = card_query._create_query_select_cards(
+            user, only_owned=only_owned, cards=[], geopoints=[], sorted_by=sorted_by, status=status,
+            properties=properties)
+        yield description, query.values("card_uuid")[:limit], Card._meta.db_table
+
+        # без фильтра по состоянию пункта card_info читает страницу из витрины списка
+        if properties is None:
+            filter_ = card_query._get_select_filter(user, only_owned=only_owned, cards=[], geopoints=[],
+                                                    status=status, listing=True)
+            keys = card_query._get_sort_keys(sorted_by)
+            query = CardListing.objects.filter(filter_).order_by(*card_query._get_ordering(keys))
+            yield f"{description} (витрина)", query.values("card_uuid")[:limit], CardListing._meta.db_table
+
+
+class Command(BaseCommand):
+    help = ("Проверяет планы запросов списка карточек (card_info) на одинаковом при каждом запуске наборе данных, "
+            "который создается в откатываемой транзакции: при запрещенном последовательном сканировании ни один "
+            "запрос не должен читать таблицу карточек или витрину списка целиком")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100, help="Размер страницы")
+        parser.add_argument("--cards", type=int, default=SEED_CARDS, help="Число карточек тестового набора")
+
+    def _check(self, description, query, table, failed):
+        plan = _explain(*query.query.sql_with_params())
+        if _find_seq_scans(plan, table):
+            failed.append(description)
+            self.stdout.write(self.style.ERROR(f"{description}: последовательное сканирование {table}"))
+        else:
+            self.stdout.write(f"{description}: {plan['Node Type']} -> {plan['Plans'][0]['Node Type']}"
+                              if plan.get("Plans") else f"{description}: {plan['Node Type']}")
+
+    def handle(self, *args, limit=100, cards=SEED_CARDS, **options):
+        failed = []
+        with transaction.atomic():
+            executor, inspector = _seed(cards)
+            for description, query, table in get_scenario_queries(executor, inspector, limit):
+                self._check(description, query, table, failed)
+
+            transaction.set_rollback(True)
+
+        if failed:
+            raise CommandError(f"Запросов без подходящего индекса: {len(failed)}")
+
+        self.stdout.write(self.style.SUCCESS("Все запросы списка карточек используют индексы"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from main_app.models import Card, CardListing
+
+__all__ = ("Command",)
+
+
+class Command(BaseCommand):
+    help = ("Перестраивает витрину списка карточек по данным карточек. С --check только проверяет, "
+            "что витрина совпадает с карточками (завершается с ошибкой при расхождении)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Только проверить витрину")
+
+    def handle(self, *args, check=False, **options):
+        if check:
+            differences = CardListing.objects.get_differences()
+            if differences:
+                raise CommandError(f"Карточек, строки витрины которых расходятся с данными: {differences}")
+
+            self.stdout.write(self.style.SUCCESS("Витрина списка карточек согласована с карточками"))
+            return
+
+        with transaction.atomic():
+            CardListing.objects.refresh()
+            Card.objects.cards_changed()
+
+        self.stdout.write(self.style.SUCCESS(f"Витрина списка карточек перестроена: {CardListing.objects.count()}"))
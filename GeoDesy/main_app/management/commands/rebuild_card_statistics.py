@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from main_app.models import CardStatistics
+
+__all__ = ("Command",)
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает счетчики статистики карточек по данным карточек. С --check только проверяет, "
+            "что счетчики совпадают с карточками (завершается с ошибкой при расхождении)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Только проверить счетчики")
+
+    def handle(self, *args, check=False, **options):
+        if check:
+            differences = CardStatistics.objects.get_differences()
+            if differences:
+                raise CommandError(f"Групп статистики, счетчики которых расходятся с данными: {differences}")
+
+            self.stdout.write(self.style.SUCCESS("Счетчики статистики согласованы с карточками"))
+            return
+
+        CardStatistics.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Счетчики статистики пересчитаны: {CardStatistics.objects.count()}"))
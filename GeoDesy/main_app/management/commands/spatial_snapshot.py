@@ -0,0 +1,27 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+import config
+from main_app.models import GeoPoint
+from utils.spatial_index import SPATIAL_INDEX_COLUMNS, write_snapshot
+
+__all__ = ("Command",)
+
+
+class Command(BaseCommand):
+    help = "Записывает снимок координат пунктов ГГС для пространственного индекса рабочих процессов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=config.SPATIAL_INDEX_SNAPSHOT,
+                            help="Путь к файлу снимка (по умолчанию SPATIAL_INDEX_SNAPSHOT)")
+
+    def handle(self, *args, output=None, **options):
+        if not output:
+            raise CommandError("Не указан путь к файлу снимка (--output или SPATIAL_INDEX_SNAPSHOT)")
+
+        created_at = datetime.utcnow()
+        with transaction.atomic():
+            rows = GeoPoint.objects.order_by("cell").values_list(*SPATIAL_INDEX_COLUMNS)
+            count = write_snapshot(output, rows.iterator(chunk_size=10000), created_at)
+
+        self.stdout.write(self.style.SUCCESS(f"Снимок {output} записан: {count} точек"))
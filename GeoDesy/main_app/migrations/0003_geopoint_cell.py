@@ -0,0 +1,50 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:06
+
+from django.db import migrations, models
+from utils.geo import Cell
+
+BATCH_SIZE = 1000
+
+
+def fill_cells(apps, schema_editor):
+    GeoPoint = apps.get_model("main_app", "GeoPoint")
+    batch = []
+    for point in GeoPoint.objects.only("guid", "latitude", "longitude").iterator(chunk_size=BATCH_SIZE):
+        point.cell = Cell.key(point.latitude, point.longitude)
+        batch.append(point)
+        if len(batch) >= BATCH_SIZE:
+            GeoPoint.objects.bulk_update(batch, ("cell",))
+            batch.clear()
+
+    if batch:
+        GeoPoint.objects.bulk_update(batch, ("cell",))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0002_inital_data'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='geopoint',
+            options={'ordering': ('latitude', 'longitude'), 'verbose_name': 'координаты', 'verbose_name_plural': 'координаты'},
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='sex',
+            field=models.TextField(choices=[('male', 'Мужской'), ('female', 'Женский'), ('unknown', 'Другое')], verbose_name='Пол'),
+        ),
+        migrations.AddField(
+            model_name='geopoint',
+            name='cell',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_cells, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='geopoint',
+            name='cell',
+            field=models.BigIntegerField(db_index=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0003_geopoint_cell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geopoint',
+            name='x',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='geopoint',
+            name='y',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='geopoint',
+            name='z',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+update main_app_geopoint
+set x = cosd(latitude) * cosd(longitude),
+    y = cosd(latitude) * sind(longitude),
+    z = sind(latitude);
+""",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='geopoint',
+            name='x',
+            field=models.FloatField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='geopoint',
+            name='y',
+            field=models.FloatField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='geopoint',
+            name='z',
+            field=models.FloatField(editable=False),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0004_geopoint_unit_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geopoint',
+            name='datetime_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
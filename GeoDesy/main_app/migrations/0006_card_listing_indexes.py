@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0005_geopoint_datetime_modification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['datetime_creation', 'card_uuid'], name='card_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['datetime_inspection', 'card_uuid'], name='card_inspected_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['status', 'datetime_creation', 'card_uuid'], name='card_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['status', 'datetime_inspection', 'card_uuid'], name='card_status_inspected_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['executor', 'datetime_creation', 'card_uuid'], name='card_executor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['inspector', 'datetime_inspection', 'card_uuid'], name='card_inspector_inspected_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(('status', 'success')), fields=['datetime_creation', 'card_uuid'], name='card_success_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(('status', 'success')), fields=['datetime_inspection', 'card_uuid'], name='card_success_inspected_idx'),
+        ),
+    ]
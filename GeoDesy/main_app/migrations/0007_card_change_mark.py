@@ -0,0 +1,74 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0006_card_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardTombstone',
+            fields=[
+                ('card_uuid', models.UUIDField(primary_key=True, serialize=False)),
+                ('datetime_deletion', models.DateTimeField(auto_now=True, verbose_name='Время удаления (UTC-формат)')),
+                ('change_xid', models.BigIntegerField(editable=False)),
+                ('change_seq', models.BigIntegerField(editable=False)),
+            ],
+            options={
+                'verbose_name': 'удаленная карточка',
+                'verbose_name_plural': 'удаленные карточки',
+                'indexes': [models.Index(fields=['change_xid', 'change_seq'], name='card_tombstone_change_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='datetime_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True, null=True,
+                                       verbose_name='Время последнего изменения (UTC-формат)'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='change_xid',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='change_seq',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+create sequence main_app_card_change_seq;
+
+update main_app_card
+set datetime_modification = coalesce(datetime_inspection, datetime_creation),
+    change_xid = pg_current_xact_id()::text::bigint,
+    change_seq = nextval('main_app_card_change_seq');
+""",
+            reverse_sql="drop sequence main_app_card_change_seq;",
+        ),
+        migrations.AlterField(
+            model_name='card',
+            name='datetime_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True,
+                                       verbose_name='Время последнего изменения (UTC-формат)'),
+        ),
+        migrations.AlterField(
+            model_name='card',
+            name='change_xid',
+            field=models.BigIntegerField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='card',
+            name='change_seq',
+            field=models.BigIntegerField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['change_xid', 'change_seq'], name='card_change_idx'),
+        ),
+    ]
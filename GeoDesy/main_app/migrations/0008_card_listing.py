@@ -0,0 +1,69 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0007_card_change_mark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardListing',
+            fields=[
+                ('card_uuid', models.UUIDField(primary_key=True, serialize=False)),
+                ('status', models.TextField(choices=[('pending', 'В процессе проверки'), ('sending', 'Отправлено'), ('success', 'Принято'), ('denied', 'Отвергнуто')])),
+                ('execute_date', models.DateField()),
+                ('datetime_creation', models.DateTimeField()),
+                ('datetime_inspection', models.DateTimeField(null=True)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('federal_subject', models.TextField()),
+                ('federal_district', models.TextField()),
+                ('executor_first_name', models.CharField(max_length=255)),
+                ('executor_second_name', models.CharField(max_length=255)),
+                ('executor_third_name', models.CharField(max_length=255)),
+                ('executor_email', models.EmailField(max_length=254)),
+                ('inspector_first_name', models.CharField(max_length=255, null=True)),
+                ('inspector_second_name', models.CharField(max_length=255, null=True)),
+                ('inspector_third_name', models.CharField(max_length=255, null=True)),
+                ('inspector_email', models.EmailField(max_length=254, null=True)),
+                ('photos_count', models.IntegerField()),
+                ('coordinates', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='main_app.geopoint')),
+                ('executor', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('inspector', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'строка списка карточек',
+                'verbose_name_plural': 'витрина списка карточек',
+                'indexes': [models.Index(fields=['datetime_creation', 'card_uuid'], name='card_listing_created_idx'), models.Index(fields=['datetime_inspection', 'card_uuid'], name='card_listing_inspected_idx'), models.Index(fields=['status', 'datetime_creation', 'card_uuid'], name='card_listing_st_created_idx'), models.Index(fields=['status', 'datetime_inspection', 'card_uuid'], name='card_listing_st_inspected_idx'), models.Index(fields=['executor', 'datetime_creation', 'card_uuid'], name='card_listing_ex_created_idx'), models.Index(fields=['inspector', 'datetime_inspection', 'card_uuid'], name='card_listing_in_inspected_idx')],
+            },
+        ),
+        migrations.RunSQL(
+            sql="""
+insert into main_app_cardlisting (
+    card_uuid, status, execute_date, datetime_creation, datetime_inspection, latitude, longitude,
+    federal_subject, federal_district, executor_first_name, executor_second_name, executor_third_name,
+    executor_email, inspector_first_name, inspector_second_name, inspector_third_name, inspector_email,
+    photos_count, coordinates_id, executor_id, inspector_id
+)
+select card.card_uuid, card.status, card.execute_date, card.datetime_creation, card.datetime_inspection,
+       point.latitude, point.longitude, subject.name, district.name,
+       executor.first_name, executor.second_name, executor.third_name, executor.email,
+       inspector.first_name, inspector.second_name, inspector.third_name, inspector.email,
+       (select count(*) from main_app_photo as photo where photo.card_ref_id = card.card_uuid),
+       card.coordinates_id, card.executor_id, card.inspector_id
+from main_app_card as card
+join main_app_geopoint as point on point.guid = card.coordinates_id
+join main_app_federalsubject as subject on subject.id = point.subject_id
+join main_app_federaldistrict as district on district.id = subject.district_id
+join main_app_user as executor on executor.id = card.executor_id
+left join main_app_user as inspector on inspector.id = card.inspector_id;
+""",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
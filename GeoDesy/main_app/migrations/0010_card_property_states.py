@@ -0,0 +1,54 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:45
+
+import django.db.models.fields.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0009_card_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(django.db.models.fields.json.KeyTransform('value', 'identification_pillar'), name='card_pillar_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(django.db.models.fields.json.KeyTransform('value', 'type_of_sign'), name='card_sign_type_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(django.db.models.fields.json.KeyTransform('value', 'monolith_one'), name='card_monolith1_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(django.db.models.fields.json.KeyTransform('value', 'monolith_two'), name='card_monolith2_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(django.db.models.fields.json.KeyTransform('value', 'monolith_three_and_four'), name='card_monolith34_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(django.db.models.fields.json.KeyTransform('value', 'outdoor_sign'), name='card_outdoor_sign_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(django.db.models.fields.json.KeyTransform('value', 'ORP_one'), name='card_orp1_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(django.db.models.fields.json.KeyTransform('value', 'ORP_two'), name='card_orp2_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(django.db.models.fields.json.KeyTransform('value', 'trench'), name='card_trench_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(django.db.models.fields.json.KeyTransform('value', 'satellite_surveillance'), name='card_satellite_state_idx'),
+        ),
+    ]
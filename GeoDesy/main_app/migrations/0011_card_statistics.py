@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0010_card_property_states'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('federal_subject', models.TextField()),
+                ('federal_district', models.TextField()),
+                ('status', models.TextField(choices=[('pending', 'В процессе проверки'), ('sending', 'Отправлено'), ('success', 'Принято'), ('denied', 'Отвергнуто')])),
+                ('month', models.DateField()),
+                ('cards_count', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'счетчик карточек',
+                'verbose_name_plural': 'статистика карточек',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cardstatistics',
+            constraint=models.UniqueConstraint(fields=('federal_subject', 'federal_district', 'status', 'month'), name='card_statistics_group_unique'),
+        ),
+        migrations.RunSQL(
+            sql="""
+insert into main_app_cardstatistics (federal_subject, federal_district, status, month, cards_count)
+select federal_subject, federal_district, status, date_trunc('month', datetime_creation)::date, count(*)
+from main_app_cardlisting
+group by 1, 2, 3, 4;
+""",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
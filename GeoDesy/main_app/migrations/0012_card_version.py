@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0011_card_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='version',
+            field=models.IntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cardlisting',
+            name='version',
+            field=models.IntegerField(default=1),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0012_card_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='previous_inspector',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='unpublished_seq',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='unpublished_xid',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+    ]
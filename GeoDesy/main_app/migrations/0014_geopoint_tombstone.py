@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0013_card_visibility_marks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeoPointTombstone',
+            fields=[
+                ('guid', models.UUIDField(primary_key=True, serialize=False)),
+                ('datetime_deletion', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Время удаления (UTC-формат)')),
+            ],
+            options={
+                'verbose_name': 'удаленные координаты',
+                'verbose_name_plural': 'удаленные координаты',
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0014_geopoint_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardtombstone',
+            name='executor',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='cardtombstone',
+            name='inspector',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='cardtombstone',
+            name='previous_inspector',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='cardtombstone',
+            name='status',
+            field=models.TextField(choices=[('pending', 'В процессе проверки'), ('sending', 'Отправлено'), ('success', 'Принято'), ('denied', 'Отвергнуто')], null=True),
+        ),
+        migrations.AddField(
+            model_name='cardtombstone',
+            name='unpublished_seq',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='cardtombstone',
+            name='unpublished_xid',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0015_card_tombstone_visibility'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardlisting',
+            name='subject',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING,
+                                    related_name='+', to='main_app.federalsubject'),
+        ),
+        migrations.RunSQL(
+            sql="""
+update main_app_cardlisting as listing
+set subject_id = point.subject_id
+from main_app_geopoint as point
+where point.guid = listing.coordinates_id;
+""",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='cardlisting',
+            name='subject',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING,
+                                    related_name='+', to='main_app.federalsubject'),
+        ),
+    ]
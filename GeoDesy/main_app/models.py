@@ -1,15 +1,28 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.fields.json import KeyTransform
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from main_app.db import *
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from utils.custom_validators import validate_russian_text
 from utils.card_tools import CardChoices, printable_coordinates
+from utils.geo import Cell, get_unit_vector
 from django.conf import settings
 
 __all__ = (
-    "User", "FederalDistrict", "FederalSubject", "GeoPoint", "TFA", "Session", "Photo", "Card"
+    "User", "FederalDistrict", "FederalSubject", "GeoPoint", "GeoPointTombstone", "TFA", "Session", "Photo", "Card",
+    "CardTombstone", "CardListing", "CardStatistics"
 )
 
 
+def _search_document(field_name, weight):
+    # знаки препинания заменяются пробелами, чтобы номенклатура вида "N-37-1" разбивалась на слова "n", "37", "1",
+    # а не на "n", "-37", "-1" (так же разбивается строка поиска, см. card_tools.search_tokens)
+    text = models.Func(models.F(field_name), models.Value(r"[^[:alnum:]]+"), models.Value(" "), models.Value("g"),
+                       function="regexp_replace")
+    return SearchVector(text, config="simple", weight=weight)
+
+
 class User(AbstractBaseUser, PermissionsMixin):
     class Sex(models.TextChoices):
         MALE = 'male', 'Мужской'
@@ -79,6 +92,12 @@ class GeoPoint(models.Model):
     latitude = models.FloatField()
     longitude = models.FloatField()
     subject = models.ForeignKey('FederalSubject', on_delete=models.PROTECT, related_name='geo_points', verbose_name="Субъект РФ")
+    cell = models.BigIntegerField(db_index=True, editable=False)
+    # координаты точки на единичной сфере
+    x = models.FloatField(editable=False)
+    y = models.FloatField(editable=False)
+    z = models.FloatField(editable=False)
+    datetime_modification = models.DateTimeField(auto_now=True, db_index=True)
 
     objects = MapQuerySet.as_manager()
 
@@ -100,10 +119,28 @@ class GeoPoint(models.Model):
     def printable_coordinates(self):
         return printable_coordinates(self)
 
+    def save(self, *args, **kwargs):
+        self.cell = Cell.key(self.latitude, self.longitude)
+        self.x, self.y, self.z = get_unit_vector(self.latitude, self.longitude)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return "     ".join(self.printable_coordinates)
 
 
+class GeoPointTombstone(models.Model):
+    """
+    Удаленная точка: нужна, чтобы рабочие процессы скрыли ее в снимке пространственного индекса
+    (SpatialIndexCache), созданном до удаления.
+    """
+    guid = models.UUIDField(primary_key=True)
+    datetime_deletion = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Время удаления (UTC-формат)")
+
+    class Meta:
+        verbose_name = 'удаленные координаты'
+        verbose_name_plural = 'удаленные координаты'
+
+
 class TFA(models.Model):
     class Event(models.TextChoices):
         Registration = "Registration", "Регистрация"
@@ -189,11 +226,85 @@ class Card(models.Model):
                                                verbose_name="Высота над уровнем моря")
     trapezoids = models.CharField(null=True, default=None, blank=True, verbose_name="Трапеции")
 
+    # поисковый вектор полей каталога (см. CardQueryset._get_search_query), вычисляется БД при записи карточки;
+    # вес поля (A - индекс пункта, B - название, C - трапеции) учитывается в ранжировании результатов поиска
+    search_vector = models.GeneratedField(
+        expression=(_search_document("point_index", "A") + _search_document("name_point", "B")
+                    + _search_document("trapezoids", "C")),
+        output_field=SearchVectorField(), db_persist=True
+    )
+
+    datetime_modification = models.DateTimeField(auto_now=True, db_index=True,
+                                                 verbose_name="Время последнего изменения (UTC-формат)")
+    # отметка изменения для синхронизации (см. CardQueryset.changes): транзакция и номер изменения
+    change_xid = models.BigIntegerField(editable=False)
+    change_seq = models.BigIntegerField(editable=False)
+    # версия данных карточки, увеличивается при каждом изменении (см. CardQueryset.update)
+    version = models.IntegerField(default=1, editable=False)
+    # отметка изменения, снявшего карточку со статуса "принято", и предыдущий проверяющий: по ним лента
+    # изменений сообщает о карточках, которые перестали быть видимы пользователю (см. CardQueryset.changes)
+    unpublished_xid = models.BigIntegerField(null=True, editable=False)
+    unpublished_seq = models.BigIntegerField(null=True, editable=False)
+    previous_inspector = models.ForeignKey('User', null=True, on_delete=models.SET_NULL, related_name='+',
+                                           editable=False)
+
     objects = CardQueryset.as_manager()
 
     class Meta:
         verbose_name = 'карточка пункта ГГС'
         verbose_name_plural = 'карточки пунктов ГГС'
+        # индексы под фильтры и сортировки списка карточек (CardQueryset._create_query_select_cards),
+        # card_uuid в конце - для однозначного порядка и постраничного чтения по курсору
+        indexes = (
+            models.Index(fields=("datetime_creation", "card_uuid"), name="card_created_idx"),
+            models.Index(fields=("datetime_inspection", "card_uuid"), name="card_inspected_idx"),
+            models.Index(fields=("status", "datetime_creation", "card_uuid"), name="card_status_created_idx"),
+            models.Index(fields=("status", "datetime_inspection", "card_uuid"), name="card_status_inspected_idx"),
+            models.Index(fields=("executor", "datetime_creation", "card_uuid"), name="card_executor_created_idx"),
+            models.Index(fields=("inspector", "datetime_inspection", "card_uuid"), name="card_inspector_inspected_idx"),
+            models.Index(fields=("datetime_creation", "card_uuid"), condition=models.Q(status="success"),
+                         name="card_success_created_idx"),
+            models.Index(fields=("datetime_inspection", "card_uuid"), condition=models.Q(status="success"),
+                         name="card_success_inspected_idx"),
+            models.Index(fields=("change_xid", "change_seq"), name="card_change_idx"),
+            GinIndex(fields=("search_vector",), name="card_search_idx"),
+            # индексы значений состояния пункта (фильтр properties списка карточек)
+            models.Index(KeyTransform("value", "identification_pillar"), name="card_pillar_state_idx"),
+            models.Index(KeyTransform("value", "type_of_sign"), name="card_sign_type_state_idx"),
+            models.Index(KeyTransform("value", "monolith_one"), name="card_monolith1_state_idx"),
+            models.Index(KeyTransform("value", "monolith_two"), name="card_monolith2_state_idx"),
+            models.Index(KeyTransform("value", "monolith_three_and_four"), name="card_monolith34_state_idx"),
+            models.Index(KeyTransform("value", "outdoor_sign"), name="card_outdoor_sign_state_idx"),
+            models.Index(KeyTransform("value", "ORP_one"), name="card_orp1_state_idx"),
+            models.Index(KeyTransform("value", "ORP_two"), name="card_orp2_state_idx"),
+            models.Index(KeyTransform("value", "trench"), name="card_trench_state_idx"),
+            models.Index(KeyTransform("value", "satellite_surveillance"), name="card_satellite_state_idx"),
+        )
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "datetime_modification", "change_xid", "change_seq", "version"}
+
+        # отметка должна принадлежать транзакции, в которой карточка изменяется
+        with transaction.atomic(using=kwargs.get("using")):
+            self.change_xid, self.change_seq = Card.objects.get_change_mark(kwargs.get("using"))
+            adding = self._state.adding
+            refreshed = ["version"]
+            if not adding:
+                # версия увеличивается в БД: экземпляр мог быть загружен до изменения карточки другим запросом
+                self.version = models.F("version") + 1
+                # выход из видимых множеств определяется по значениям полей в БД до изменения
+                leave_fields = Card.objects.get_leave_fields(self.change_xid, self.change_seq, self.status,
+                                                             self.inspector_id)
+                for field_name, value in leave_fields.items():
+                    setattr(self, field_name, value)
+                refreshed.extend(leave_fields)
+                if kwargs.get("update_fields") is not None:
+                    kwargs["update_fields"] = {*kwargs["update_fields"], *leave_fields}
+            super().save(*args, **kwargs)
+            if not adding:
+                self.refresh_from_db(using=kwargs.get("using"), fields=refreshed)
 
     @property
     def photos_url(self):
@@ -205,3 +316,108 @@ class Card(models.Model):
 
     def __str__(self):
         return f'Карточка/{self.pk}'
+
+
+class CardTombstone(models.Model):
+    """
+    Удаленная карточка: нужна, чтобы клиенты синхронизации (CardQueryset.changes) узнали об удалении.
+    Статус, владельцы и отметки видимости карточки сохраняются на момент удаления: об удалении узнают только
+    те, кому карточка была видна (записи, удаленные до появления этих полей, видны только сотрудникам).
+    """
+    card_uuid = models.UUIDField(primary_key=True)
+    datetime_deletion = models.DateTimeField(auto_now=True, verbose_name="Время удаления (UTC-формат)")
+    change_xid = models.BigIntegerField(editable=False)
+    change_seq = models.BigIntegerField(editable=False)
+    status = models.TextField(choices=Card.StatusChoice.choices, null=True)
+    executor = models.ForeignKey('User', null=True, on_delete=models.DO_NOTHING, db_constraint=False,
+                                 db_index=False, related_name='+')
+    inspector = models.ForeignKey('User', null=True, on_delete=models.DO_NOTHING, db_constraint=False,
+                                  db_index=False, related_name='+')
+    unpublished_xid = models.BigIntegerField(null=True, editable=False)
+    unpublished_seq = models.BigIntegerField(null=True, editable=False)
+    previous_inspector = models.ForeignKey('User', null=True, on_delete=models.DO_NOTHING, db_constraint=False,
+                                           db_index=False, related_name='+')
+
+    class Meta:
+        verbose_name = 'удаленная карточка'
+        verbose_name_plural = 'удаленные карточки'
+        indexes = (
+            models.Index(fields=("change_xid", "change_seq"), name="card_tombstone_change_idx"),
+        )
+
+
+class CardListing(models.Model):
+    """
+    Витрина списка карточек: поля карточки, ее координат и владельцев в одной строке, чтобы список
+    карточек (card_info) читался без соединений таблиц. Обновляется в той же транзакции, что и данные
+    карточки (CardListingQuerySet.refresh), полностью перестраивается командой rebuild_card_listing.
+    """
+    card_uuid = models.UUIDField(primary_key=True)
+    status = models.TextField(choices=Card.StatusChoice.choices)
+    execute_date = models.DateField()
+    datetime_creation = models.DateTimeField()
+    datetime_inspection = models.DateTimeField(null=True)
+
+    coordinates = models.ForeignKey('GeoPoint', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    subject = models.ForeignKey('FederalSubject', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    federal_subject = models.TextField()
+    federal_district = models.TextField()
+
+    executor = models.ForeignKey('User', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+                                 related_name='+')
+    executor_first_name = models.CharField(max_length=255)
+    executor_second_name = models.CharField(max_length=255)
+    executor_third_name = models.CharField(max_length=255)
+    executor_email = models.EmailField()
+
+    inspector = models.ForeignKey('User', null=True, on_delete=models.DO_NOTHING, db_constraint=False,
+                                  db_index=False, related_name='+')
+    inspector_first_name = models.CharField(max_length=255, null=True)
+    inspector_second_name = models.CharField(max_length=255, null=True)
+    inspector_third_name = models.CharField(max_length=255, null=True)
+    inspector_email = models.EmailField(null=True)
+
+    photos_count = models.IntegerField()
+    version = models.IntegerField()
+
+    objects = CardListingQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'строка списка карточек'
+        verbose_name_plural = 'витрина списка карточек'
+        # те же индексы, что у Card, под фильтры и сортировки списка
+        indexes = (
+            models.Index(fields=("datetime_creation", "card_uuid"), name="card_listing_created_idx"),
+            models.Index(fields=("datetime_inspection", "card_uuid"), name="card_listing_inspected_idx"),
+            models.Index(fields=("status", "datetime_creation", "card_uuid"), name="card_listing_st_created_idx"),
+            models.Index(fields=("status", "datetime_inspection", "card_uuid"), name="card_listing_st_inspected_idx"),
+            models.Index(fields=("executor", "datetime_creation", "card_uuid"), name="card_listing_ex_created_idx"),
+            models.Index(fields=("inspector", "datetime_inspection", "card_uuid"),
+                         name="card_listing_in_inspected_idx"),
+        )
+
+
+class CardStatistics(models.Model):
+    """
+    Счетчики карточек по субъекту, федеральному округу, статусу и месяцу создания для статистики.
+    Изменяются вместе с витриной списка карточек (CardListingQuerySet.refresh), полностью
+    пересчитываются командой rebuild_card_statistics.
+    """
+    federal_subject = models.TextField()
+    federal_district = models.TextField()
+    status = models.TextField(choices=Card.StatusChoice.choices)
+    # первый день месяца создания карточек
+    month = models.DateField()
+    cards_count = models.IntegerField()
+
+    objects = CardStatisticsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'счетчик карточек'
+        verbose_name_plural = 'статистика карточек'
+        constraints = (
+            models.UniqueConstraint(fields=("federal_subject", "federal_district", "status", "month"),
+                                    name="card_statistics_group_unique"),
+        )
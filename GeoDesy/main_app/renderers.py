@@ -0,0 +1,19 @@
+from rest_framework.renderers import BaseRenderer
+from utils.map_tiles import TILE_MEDIA_TYPE
+
+__all__ = ("MapTileRenderer",)
+
+
+class MapTileRenderer(BaseRenderer):
+    """
+    Отдает уже закодированный тайл карты (utils.map_tiles.encode_tile) без изменений.
+    """
+    media_type = TILE_MEDIA_TYPE
+    format = "tile"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return data
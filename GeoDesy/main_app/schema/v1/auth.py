@@ -15,6 +15,7 @@ __all__ = (
 
 class JWTAuthenticationScheme(OpenApiAuthenticationExtension):
     target_class = 'main_app.auth.JWTAuthentication'  # full import path OR class ref
+    match_subclasses = True  # OptionalJWTAuthentication
     name = 'JWTAuthentication'  # name used in the schema
 
     def get_security_definition(self, auto_schema):
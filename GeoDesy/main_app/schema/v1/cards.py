@@ -1,7 +1,8 @@
 from drf_spectacular.extensions import OpenApiViewExtension
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.views import extend_schema
 from drf_spectacular.utils import OpenApiExample
-from rest_framework import status
+from rest_framework import status, serializers
 from rest_framework.parsers import JSONParser
 from rest_framework.views import APIView
 from main_app.views.v1.JWT import JWTAuthenticationAPIView
@@ -9,7 +10,8 @@ from main_app.serializers.v1 import cards
 from utils.upload_files.parsers import LimitedMultiPartParser
 
 __all__ = (
-    "DownloadCardPDFSchema", "CreateCardSchema", "ShowCardSchema", "UpdateCardSchema"
+    "DownloadCardPDFSchema", "CreateCardSchema", "CreateCardBatchSchema", "ShowCardSchema", "ShowCardCacheStatsSchema",
+    "ExportCardSchema", "CardChangesSchema", "CardStatisticsSchema", "UpdateCardSchema", "UpdateCardBatchSchema"
 )
 
 
@@ -159,13 +161,185 @@ class CreateCardMock(JWTAuthenticationAPIView):
         ...
 
 
+CREATE_CARD_BATCH_STATUSES = ("created", "exists", "invalid")
+
+
+class CreateCardBatchItemResponse(serializers.Serializer):
+    key = serializers.CharField(allow_null=True)
+    status = serializers.ChoiceField(choices=CREATE_CARD_BATCH_STATUSES)
+    card_uuid = serializers.UUIDField(required=False)
+    errors = serializers.DictField(required=False)
+
+
+class CreateCardBatchResponse(serializers.Serializer):
+    results = CreateCardBatchItemResponse(many=True)
+
+
+class CreateCardBatchMock(JWTAuthenticationAPIView):
+    parser_classes = (LimitedMultiPartParser,)
+
+    @extend_schema(
+        tags=["Карточки ГГС"],
+        summary="Создание пакета карточек ГГС",
+        description="""
+<pre>
+cards - JSON-список карточек (не более 50) с полями, как при создании одной карточки, и ключом key,
+уникальным для карточек исполнителя. photos карточки - список имен частей запроса с файлами фотографий.
+Результат возвращается по каждой карточке в порядке cards: created - создана, exists - карточка
+с этим ключом уже была создана (повтор пакета), invalid - ошибки в errors, карточка не создана.
+</pre>
+""",
+        examples=[OpenApiExample("Пример запроса", request_only=True, media_type="multipart/form-data",
+                                 value=
+                                 'cards=[{"key":"2024-07-10-1","execute_date":"2024-07-10",'
+                                 '"federal_subject":"Белгородская область","latitude":50.6,"longitude":36.6,'
+                                 '"sign_height_above_ground_level":-0.23,"sign_height":4.7,'
+                                 '"photos":["p1","p2"],"type_of_sign":{"value":"no_sign"},...}]\n'
+                                 'p1=@some_photo1.png;type=image/png\n'
+                                 'p2=@some_photo2.png;type=image/png\n'
+                                 ),
+                  ],
+        request={"multipart/form-data": cards.CreateCardBatchSerializer},
+        responses={status.HTTP_200_OK: CreateCardBatchResponse}
+    )
+    def post(self, request):
+        ...
+
+
+class ShowCardResponse(serializers.Serializer):
+    cards = serializers.ListField(child=serializers.DictField())
+    count = serializers.IntegerField(allow_null=True)
+    next_cursor = serializers.CharField(allow_null=True)
+    prev_cursor = serializers.CharField(allow_null=True)
+
+
 class ShowCardMock(JWTAuthenticationAPIView):
 
     @extend_schema(
         tags=["Карточки ГГС"],
         summary="Информация о карточках ГГС",
+        description="""
+<pre>
+Страница задается смещением offset или курсором cursor из next_cursor/prev_cursor предыдущего ответа
+(курсор действителен только с тем же sorted_by; offset вместе с cursor не задается).
+Курсор указывает позицию в списке, поэтому по курсорам можно пройти весь список на любую глубину.
+next_cursor/prev_cursor равны null, если следующей/предыдущей страницы нет.
+count_mode задает вычисление общего числа карточек count: exact - точное (по умолчанию),
+estimated - приблизительное по статистике БД, cached - точное, но из кэша (обновляется при изменении
+карточек), none - не вычисляется (count равен null).
+search - поиск по № по каталогу/индексу пункта, названию пункта и трапециям: выбираются карточки,
+содержащие все слова строки как начала слов (например, "N-37 Липов"), сначала наиболее подходящие,
+затем в порядке sorted_by. С search страницы задаются только offset, курсоры не выдаются.
+federal_subject, federal_district - отбор по субъекту и федеральному округу пункта.
+properties - отбор по состоянию пункта: для каждого заданного поля - список допустимых значений value,
+например {"monolith_one": ["unsaved"], "trench": ["unreadable"]}.
+</pre>
+""",
         request=cards.ShowCardSerializer,
-        responses={status.HTTP_200_OK: cards.ShowCardSerializer(many=True)}
+        responses={status.HTTP_200_OK: ShowCardResponse}
+    )
+    def post(self, request):
+        ...
+
+
+class CacheNamespaceStatsResponse(serializers.Serializer):
+    alias = serializers.CharField()
+    version = serializers.CharField(allow_null=True)
+    hits = serializers.IntegerField()
+    misses = serializers.IntegerField()
+
+
+class ShowCardCacheStatsResponse(serializers.Serializer):
+    responses = CacheNamespaceStatsResponse()
+    counts = CacheNamespaceStatsResponse()
+
+
+class CardChangesResponse(serializers.Serializer):
+    cards = serializers.ListField(child=serializers.DictField())
+    deleted = serializers.ListField(child=serializers.UUIDField())
+    watermark = serializers.CharField(allow_null=True)
+    has_more = serializers.BooleanField()
+
+
+class CardChangesMock(JWTAuthenticationAPIView):
+
+    @extend_schema(
+        tags=["Карточки ГГС"],
+        summary="Изменения карточек ГГС для синхронизации",
+        description="""
+<pre>
+Возвращает карточки, измененные после отметки since (watermark предыдущего ответа; null - с начала),
+в порядке изменения. cards - измененные карточки, видимые пользователю (как в card/info с тем же
+only_owned), deleted - card_uuid удаленных карточек, которые были видны пользователю, и карточек, которые
+перестали быть видны ему после since: сняты со статуса "принято" или (для проверенных сотрудником) переданы
+другому проверяющему.
+Пока has_more равен true, следует повторять запрос с since, равным полученному watermark.
+</pre>
+""",
+        request=cards.CardChangesSerializer,
+        responses={status.HTTP_200_OK: CardChangesResponse}
+    )
+    def post(self, request):
+        ...
+
+
+class CardStatisticsGroupResponse(serializers.Serializer):
+    federal_subject = serializers.CharField(required=False)
+    federal_district = serializers.CharField(required=False)
+    status = serializers.CharField(required=False)
+    month = serializers.DateField(required=False)
+    count = serializers.IntegerField()
+
+
+class CardStatisticsResponse(serializers.Serializer):
+    groups = CardStatisticsGroupResponse(many=True)
+
+
+class CardStatisticsMock(JWTAuthenticationAPIView):
+
+    @extend_schema(
+        tags=["Карточки ГГС"],
+        summary="Статистика карточек ГГС (только для сотрудников)",
+        description="""
+<pre>
+Число карточек в группах по полям group_by (federal_subject, federal_district, status, month;
+пустой список - одна группа со всеми карточками). month - первый день месяца создания карточек.
+В группе выводятся только поля group_by и count; группы без карточек не выводятся.
+status, federal_subject, federal_district, month_from и month_to (включительно, по месяцу) отбирают карточки.
+</pre>
+""",
+        request=cards.CardStatisticsSerializer,
+        responses={status.HTTP_200_OK: CardStatisticsResponse}
+    )
+    def post(self, request):
+        ...
+
+
+class ShowCardCacheStatsMock(JWTAuthenticationAPIView):
+
+    @extend_schema(
+        tags=["Карточки ГГС"],
+        summary="Состояние кэша списка карточек (счетчики рабочего процесса)",
+        responses={status.HTTP_200_OK: ShowCardCacheStatsResponse}
+    )
+    def get(self, request):
+        ...
+
+
+class ExportCardMock(JWTAuthenticationAPIView):
+
+    @extend_schema(
+        tags=["Карточки ГГС"],
+        summary="Выгрузка карточек ГГС (только для сотрудников)",
+        description="""
+<pre>
+Ответ - поток NDJSON: по одной карточке со всеми полями (как в card/info) на строку, в порядке card_uuid.
+modified_from/modified_to ограничивают время последнего изменения карточки (datetime_modification):
+modified_from включительно, modified_to - не включая.
+</pre>
+""",
+        request=cards.ExportCardSerializer,
+        responses={(status.HTTP_200_OK, "application/x-ndjson"): OpenApiTypes.OBJECT}
     )
     def post(self, request):
         ...
@@ -181,12 +355,63 @@ class DownloadCardPDFMock(APIView):
         ...
 
 
+class UpdateCardResponse(serializers.Serializer):
+    card_uuid = serializers.UUIDField()
+    version = serializers.IntegerField()
+
+
 class UpdateCardMock(JWTAuthenticationAPIView):
     @extend_schema(
         tags=["Карточки ГГС"],
         summary="Обновление информации о карточке ГГС",
+        description="""
+<pre>
+Изменяются только переданные поля; рекомендации к полям состояния пункта дополняют их значения.
+version - версия карточки (поле version из card/info), с которой работал проверяющий. Если карточку
+с тех пор изменили, ответ - 409 (изменения не сохраняются): карточку нужно получить заново.
+В ответе - новая версия карточки.
+</pre>
+""",
         request=cards.UpdateCardForStuffSerializer,
-        responses=None
+        responses={status.HTTP_200_OK: UpdateCardResponse}
+    )
+    def post(self, request):
+        ...
+
+
+class UpdateCardBatchRequest(serializers.Serializer):
+    cards = cards.CardReviewSerializer(many=True)
+
+
+UPDATE_CARD_BATCH_STATUSES = ("updated", "conflict", "not_found", "invalid")
+
+
+class UpdateCardBatchItemResponse(serializers.Serializer):
+    card_uuid = serializers.UUIDField(allow_null=True)
+    status = serializers.ChoiceField(choices=UPDATE_CARD_BATCH_STATUSES)
+    version = serializers.IntegerField(required=False, allow_null=True)
+    errors = serializers.DictField(required=False)
+
+
+class UpdateCardBatchResponse(serializers.Serializer):
+    results = UpdateCardBatchItemResponse(many=True)
+
+
+class UpdateCardBatchMock(JWTAuthenticationAPIView):
+    @extend_schema(
+        tags=["Карточки ГГС"],
+        summary="Проверка пакета карточек ГГС (только для сотрудников)",
+        description="""
+<pre>
+cards - список карточек (не более 200) с полями, как при обновлении одной карточки: статус, version
+и рекомендации к полям состояния пункта. Все карточки пакета изменяются в одной транзакции.
+Результат возвращается по каждой карточке в порядке cards: updated - карточка изменена (в version
+новая версия), conflict - карточку изменили после получения version (в version текущая версия,
+изменения не сохраняются), not_found - карточки нет, invalid - ошибки в errors.
+</pre>
+""",
+        request=UpdateCardBatchRequest,
+        responses={status.HTTP_200_OK: UpdateCardBatchResponse}
     )
     def post(self, request):
         ...
@@ -206,6 +431,13 @@ class CreateCardSchema(OpenApiViewExtension):
         return CreateCardMock
 
 
+class CreateCardBatchSchema(OpenApiViewExtension):
+    target_class = 'main_app.views.v1.cards.CreateCardBatchAPIView'
+
+    def view_replacement(self):
+        return CreateCardBatchMock
+
+
 class ShowCardSchema(OpenApiViewExtension):
     target_class = 'main_app.views.v1.cards.ShowCardAPIView'
 
@@ -213,8 +445,43 @@ class ShowCardSchema(OpenApiViewExtension):
         return ShowCardMock
 
 
+class ShowCardCacheStatsSchema(OpenApiViewExtension):
+    target_class = 'main_app.views.v1.cards.ShowCardCacheStatsAPIView'
+
+    def view_replacement(self):
+        return ShowCardCacheStatsMock
+
+
 class UpdateCardSchema(OpenApiViewExtension):
     target_class = 'main_app.views.v1.cards.UpdateCardAPIView'
 
     def view_replacement(self):
         return UpdateCardMock
+
+
+class ExportCardSchema(OpenApiViewExtension):
+    target_class = 'main_app.views.v1.cards.ExportCardAPIView'
+
+    def view_replacement(self):
+        return ExportCardMock
+
+
+class CardChangesSchema(OpenApiViewExtension):
+    target_class = 'main_app.views.v1.cards.CardChangesAPIView'
+
+    def view_replacement(self):
+        return CardChangesMock
+
+
+class CardStatisticsSchema(OpenApiViewExtension):
+    target_class = 'main_app.views.v1.cards.CardStatisticsAPIView'
+
+    def view_replacement(self):
+        return CardStatisticsMock
+
+
+class UpdateCardBatchSchema(OpenApiViewExtension):
+    target_class = 'main_app.views.v1.cards.UpdateCardBatchAPIView'
+
+    def view_replacement(self):
+        return UpdateCardBatchMock
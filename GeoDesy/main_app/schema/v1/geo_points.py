@@ -1,11 +1,15 @@
 from drf_spectacular.extensions import OpenApiViewExtension
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.views import extend_schema
 from rest_framework import status, serializers
+from main_app.auth import OptionalJWTAuthentication
 from main_app.views.base_view import BaseApiView
+from main_app.views.v1.JWT import JWTAuthenticationAPIView
 from main_app.serializers.v1 import geo_points
+from utils.map_tiles import TILE_MEDIA_TYPE
 
 __all__ = (
-    "GeoPointSchema",
+    "GeoPointSchema", "GeoClusterSchema", "GeoTileSchema", "GeoPointIndexStatsSchema"
 )
 
 
@@ -13,12 +17,73 @@ class GeoPointResponse(serializers.Serializer):
     latitude = serializers.FloatField(min_value=-90, max_value=90)
     longitude = serializers.FloatField(min_value=-180, max_value=180)
     guid = serializers.UUIDField()
+    distance = serializers.FloatField(required=False, help_text="Расстояние до точки в метрах (только при nearest)")
+
+
+class GeoPointShortResponse(serializers.Serializer):
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    guid = serializers.UUIDField()
+
+
+class GeoClusterItemResponse(serializers.Serializer):
+    cell = serializers.IntegerField(help_text="Ключ ячейки кластера на уровне level")
+    count = serializers.IntegerField()
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    statuses = serializers.DictField(child=serializers.IntegerField(),
+                                     help_text="Число карточек точек кластера по статусам "
+                                               "(не сотрудникам - только принятых)")
+
+
+class GeoClusterResponse(serializers.Serializer):
+    zoom = serializers.IntegerField()
+    level = serializers.IntegerField()
+    clusters = GeoClusterItemResponse(many=True)
+    points = GeoPointShortResponse(many=True)
+
+
+class GeoTilePointResponse(GeoPointShortResponse):
+    subject_id = serializers.IntegerField()
+
+
+class GeoTileResponse(serializers.Serializer):
+    z = serializers.IntegerField()
+    x = serializers.IntegerField()
+    y = serializers.IntegerField()
+    points = GeoTilePointResponse(many=True)
+
+
+class GeoPointIndexStatsResponse(serializers.Serializer):
+    enabled = serializers.BooleanField()
+    built = serializers.BooleanField()
+    generation = serializers.IntegerField()
+    size = serializers.IntegerField()
+    overlay_size = serializers.IntegerField()
+    mapped = serializers.BooleanField()
+    snapshot_created_at = serializers.DateTimeField(allow_null=True)
+    hits = serializers.IntegerField()
+    builds = serializers.IntegerField()
+    notifications = serializers.IntegerField()
+    listener_alive = serializers.BooleanField()
+    built_at = serializers.DateTimeField(allow_null=True)
+    last_change_at = serializers.DateTimeField(allow_null=True)
+    last_notification_at = serializers.DateTimeField(allow_null=True)
 
 
 class GeoPointMock(BaseApiView):
     @extend_schema(
         tags=["Карта"],
         summary="Получение списка координат пунктов ГГС",
+        description="""
+<pre>
+Без параметра nearest возвращаются все пункты в квадрате со стороной 2 * radius вокруг заданной точки.
+С параметром nearest возвращаются не более nearest ближайших пунктов в круге радиуса radius (в метрах),
+упорядоченные по возрастанию расстояния.
+С параметром stream ответ передается частями по мере чтения из БД: stream=json - JSON-массив,
+stream=ndjson - по одному JSON-объекту на строку (application/x-ndjson).
+</pre>
+""",
         request=geo_points.GeoPointSerializer,
         responses={status.HTTP_200_OK: GeoPointResponse(many=True)}
     )
@@ -31,3 +96,85 @@ class GeoPointSchema(OpenApiViewExtension):
 
     def view_replacement(self):
         return GeoPointMock
+
+
+class GeoClusterMock(BaseApiView):
+    authentication_classes = (OptionalJWTAuthentication,)
+
+    @extend_schema(
+        tags=["Карта"],
+        summary="Получение кластеров пунктов ГГС в области просмотра",
+        description="""
+<pre>
+Область просмотра задается границами широты и долготы; если min_longitude больше max_longitude,
+область пересекает 180-й меридиан.
+Возвращаются кластеры с числом пунктов, центром и числом карточек по статусам (сотрудникам - по всем
+статусам, остальным пользователям и без авторизации - только принятых карточек). Начиная с масштаба
+zoom = 14 вместо кластеров возвращаются сами пункты (points), если их в области не больше 2000.
+</pre>
+""",
+        request=geo_points.GeoClusterSerializer,
+        responses={status.HTTP_200_OK: GeoClusterResponse}
+    )
+    def post(self, request):
+        ...
+
+
+class GeoClusterSchema(OpenApiViewExtension):
+    target_class = 'main_app.views.v1.geo_points.GeoClusterAPIView'
+
+    def view_replacement(self):
+        return GeoClusterMock
+
+
+class GeoTileMock(BaseApiView):
+    @extend_schema(
+        tags=["Карта"],
+        summary="Получение пунктов ГГС тайла карты",
+        description=f"""
+<pre>
+Тайл задается по схеме XYZ веб-карт (проекция Меркатора), z не меньше 8; крайние по широте тайлы
+продолжаются до полюсов.
+Формат ответа выбирается заголовком Accept (или параметром format=tile|json):
+{TILE_MEDIA_TYPE} - двоичный формат (utils.map_tiles.decode_tile):
+    заголовок (little-endian): b"GDT1", z (uint8), x (uint32), y (uint32), число точек n (uint32);
+    n пар (широта, долгота) - разности с предыдущей точкой в единицах 1e-7 градуса относительно
+    нижнего левого угла тайла (zigzag varint);
+    n кодов субъектов (zigzag varint);
+    n guid (по 16 байт).
+application/json - те же точки в JSON.
+Ответ содержит ETag; при совпадении с If-None-Match возвращается 304.
+</pre>
+""",
+        responses={
+            (status.HTTP_200_OK, "application/json"): GeoTileResponse,
+            (status.HTTP_200_OK, TILE_MEDIA_TYPE): OpenApiTypes.BINARY,
+            status.HTTP_304_NOT_MODIFIED: None,
+        }
+    )
+    def get(self, request, z, x, y):
+        ...
+
+
+class GeoTileSchema(OpenApiViewExtension):
+    target_class = 'main_app.views.v1.geo_points.GeoTileAPIView'
+
+    def view_replacement(self):
+        return GeoTileMock
+
+
+class GeoPointIndexStatsMock(JWTAuthenticationAPIView):
+    @extend_schema(
+        tags=["Карта"],
+        summary="Состояние кэша пространственного индекса рабочего процесса",
+        responses={status.HTTP_200_OK: GeoPointIndexStatsResponse}
+    )
+    def get(self, request):
+        ...
+
+
+class GeoPointIndexStatsSchema(OpenApiViewExtension):
+    target_class = 'main_app.views.v1.geo_points.GeoPointIndexStatsAPIView'
+
+    def view_replacement(self):
+        return GeoPointIndexStatsMock
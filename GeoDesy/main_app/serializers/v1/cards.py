@@ -1,15 +1,21 @@
 from datetime import datetime
 
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
 from rest_framework import serializers
 from rest_framework.fields import empty
+import json
 import ujson
 from main_app.exceptions import ValidateError
-from main_app.exceptions import NotFoundAPIError
+from main_app.exceptions import NotFoundAPIError, ConflictAPIError
+import config
 from utils import context, card_tools
-from main_app.models import Card
+from main_app.models import Card, CardStatistics
 
 __all__ = (
-    "CreateCardForUserSerializer", "UpdateCardForStuffSerializer", "ShowCardSerializer"
+    "CreateCardForUserSerializer", "UpdateCardForStuffSerializer", "ShowCardSerializer", "ExportCardSerializer",
+    "CardChangesSerializer", "CreateCardBatchSerializer", "CardReviewSerializer", "UpdateCardBatchSerializer",
+    "CardStatisticsSerializer"
 )
 
 
@@ -18,6 +24,9 @@ class BaseCardSerializer(serializers.Serializer):
         primitive_value = dictionary.get(self.field_name, None)
         if primitive_value is None:
             return empty
+        if isinstance(primitive_value, dict):
+            # в пакете карточек (CreateCardBatchSerializer) свойства уже разобраны из JSON
+            return primitive_value
         try:
             dict_data = ujson.decode(primitive_value)
 
@@ -156,9 +165,80 @@ class CreateCardForStuffSerializer(UserInput, StuffInput, PhotoSerializer, CardP
         return card
 
 
-class UpdateCardForStuffSerializer(StuffInput):
+class BatchItemKeySerializer(serializers.Serializer):
+    key = serializers.CharField(max_length=64)
+
+
+class CreateCardBatchItemForUserSerializer(BatchItemKeySerializer, CreateCardForUserSerializer):
+    pass
+
+
+class CreateCardBatchItemForStuffSerializer(BatchItemKeySerializer, CreateCardForStuffSerializer):
+    pass
+
+
+class CreateCardBatchSerializer(serializers.Serializer):
+    """
+    Пакет карточек: cards - JSON-список карточек с полями как у card/create и ключом идемпотентности key,
+    photos карточки - имена частей запроса с файлами фотографий. Ошибки карточек не прерывают пакет,
+    результат возвращается по каждой карточке.
+    """
+    cards = serializers.JSONField(binary=True)
+
+    def validate_cards(self, value):
+        if not isinstance(value, list) or not all(isinstance(item, dict) for item in value):
+            raise ValidateError("Ожидается список карточек")
+        if not 0 < len(value) <= config.CARD_BATCH_MAX_SIZE:
+            raise ValidateError(f"Пакет должен содержать от 1 до {config.CARD_BATCH_MAX_SIZE} карточек")
+        return value
+
+    def _get_item_data(self, item):
+        data = dict(item)
+        photos = data.get("photos")
+        if isinstance(photos, list):
+            data["photos"] = [self.initial_data.get(name) if isinstance(name, str) else None for name in photos]
+        return data
+
+    def create(self, validated_data):
+        ctx = context.CurrentContext()
+        user = ctx.user
+        if user.is_staff:
+            item_serializer_class = CreateCardBatchItemForStuffSerializer
+            defaults = {"inspector": user, "datetime_inspection": datetime.utcnow()}
+        else:
+            item_serializer_class = CreateCardBatchItemForUserSerializer
+            defaults = {"inspector": None, "status": Card.StatusChoice.SENDING}
+
+        results, items, keys = [], [], set()
+        for item in validated_data["cards"]:
+            serializer = item_serializer_class(data=self._get_item_data(item))
+            if not serializer.is_valid():
+                results.append({"key": item.get("key"), "status": "invalid", "errors": serializer.errors})
+                continue
+
+            key = serializer.validated_data["key"]
+            if key in keys:
+                results.append({"key": key, "status": "invalid", "errors": {"key": ["Ключ повторяется в пакете"]}})
+                continue
+
+            keys.add(key)
+            results.append({"key": key})
+            items.append(defaults | serializer.validated_data)
+
+        created = iter(Card.objects.create_batch(user, items=items) if items else ())
+        for result in results:
+            if "status" not in result:
+                card_uuid, is_created = next(created)
+                result.update(card_uuid=card_uuid, status="created" if is_created else "exists")
+
+        ctx.response = {"results": results}
+        return user
+
+
+class CardReviewSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=Card.StatusChoiceWithOutSending.choices)
     card_uuid = serializers.UUIDField()
+    version = serializers.IntegerField(min_value=1)
     identification_pillar = RecommendationSerializer(required=False)
     type_of_sign = RecommendationSerializer(required=False)
     monolith_one = RecommendationSerializer(required=False)
@@ -170,20 +250,62 @@ class UpdateCardForStuffSerializer(StuffInput):
     trench = RecommendationSerializer(required=False)
     satellite_surveillance = RecommendationSerializer(required=False)
 
+
+class UpdateCardBatchSerializer(serializers.Serializer):
+    """
+    Пакет проверки карточек: cards - список карточек с полями CardReviewSerializer. Ошибки карточек
+    не прерывают пакет, результат возвращается по каждой карточке.
+    """
+    cards = serializers.ListField(child=serializers.DictField(), min_length=1,
+                                  max_length=config.CARD_UPDATE_BATCH_MAX_SIZE)
+
     def create(self, validated_data):
-        copy_data = validated_data.copy()
-        card_uuid = copy_data.pop("card_uuid")
-        try:
+        ctx = context.CurrentContext()
+        user = ctx.user
+        results, items, card_uuids = [], [], set()
+        for item in validated_data["cards"]:
+            serializer = CardReviewSerializer(data=item)
+            if not serializer.is_valid():
+                results.append({"card_uuid": item.get("card_uuid"), "status": "invalid",
+                                "errors": serializer.errors})
+                continue
+
+            card_uuid = serializer.validated_data["card_uuid"]
+            if card_uuid in card_uuids:
+                results.append({"card_uuid": card_uuid, "status": "invalid",
+                                "errors": {"card_uuid": ["Карточка повторяется в пакете"]}})
+                continue
+
+            card_uuids.add(card_uuid)
+            results.append({"card_uuid": card_uuid})
+            items.append(serializer.validated_data)
+
+        reviewed = iter(Card.objects.update_batch(user, items=items) if items else ())
+        for result in results:
+            if "status" not in result:
+                status, version = next(reviewed)
+                result.update(status=status, version=version)
+
+        ctx.response = {"results": results}
+        return user
 
-            card = Card.objects.get(card_uuid=card_uuid)
 
-        except Card.DoesNotExist:
-            raise NotFoundAPIError(f'Объект с card_id({card_uuid}) не существует.')
+class UpdateCardForStuffSerializer(StuffInput, CardReviewSerializer):
 
+    def create(self, validated_data):
+        copy_data = validated_data.copy()
+        card_uuid = copy_data.pop("card_uuid")
         ctx = context.CurrentContext()
         user = ctx.user
-        update_card = Card.objects.update(card, user, **copy_data)
-        return update_card
+        version = Card.objects.update(card_uuid, user, **copy_data)
+        if version is None:
+            if not Card.objects.filter(card_uuid=card_uuid).exists():
+                raise NotFoundAPIError(f'Объект с card_id({card_uuid}) не существует.')
+            raise ConflictAPIError(f'Карточка {card_uuid} была изменена после получения версии '
+                                   f'{validated_data["version"]}. Получите карточку заново.')
+
+        ctx.response = {"card_uuid": card_uuid, "version": version}
+        return user
 
 
 class SortedField(serializers.Serializer):
@@ -196,6 +318,24 @@ class OwnedCardField(serializers.Serializer):
     as_inspector = serializers.BooleanField(required=False, default=False)
 
 
+def _property_values_field(choices):
+    return serializers.ListField(child=serializers.ChoiceField(choices=choices), required=False, min_length=1,
+                                 max_length=len(choices))
+
+
+class CardPropertyFilterSerializer(serializers.Serializer):
+    identification_pillar = _property_values_field(card_tools.DetectedPropertyChoice.choices)
+    type_of_sign = _property_values_field(card_tools.TypeSignChoice.choices)
+    monolith_one = _property_values_field(card_tools.SavingPropertyChoice.choices)
+    monolith_two = _property_values_field(card_tools.CoveringPropertyChoice.choices)
+    monolith_three_and_four = _property_values_field(card_tools.CoveringPropertyChoice.choices)
+    outdoor_sign = _property_values_field(card_tools.SavingPropertyChoice.choices)
+    ORP_one = _property_values_field(card_tools.SavingPropertyChoice.choices)
+    ORP_two = _property_values_field(card_tools.SavingPropertyChoice.choices)
+    trench = _property_values_field(card_tools.ReadingPropertyChoice.choices)
+    satellite_surveillance = _property_values_field(card_tools.PossiblePropertyChoice.choices)
+
+
 class ShowCardSerializer(serializers.Serializer):
     cards = serializers.ListField(child=serializers.UUIDField(), required=False, max_length=100, default=list)
     geopoints = serializers.ListField(child=serializers.UUIDField(), required=False, max_length=100, default=list)
@@ -203,10 +343,51 @@ class ShowCardSerializer(serializers.Serializer):
                                              required=False, allow_empty=True, max_length=100)
 
     sorted_by = serializers.ListField(child=SortedField(), required=False, allow_null=True, default=list)
-    status = serializers.ChoiceField(choices=Card.StatusChoice, required=False, allow_null=True, default=None)
+    status = serializers.ChoiceField(choices=Card.StatusChoice.choices, required=False, allow_null=True, default=None)
     limit = serializers.IntegerField(min_value=0, max_value=1000, required=False, default=100)
     offset = serializers.IntegerField(min_value=0, max_value=1000, required=False, default=0)
+    cursor = serializers.CharField(required=False, allow_null=True, default=None, max_length=2048)
+    count_mode = serializers.ChoiceField(choices=("exact", "estimated", "cached", "none"), required=False,
+                                         default="exact")
     only_owned = OwnedCardField(required=False, default={"as_executor": True, "as_inspector": False})
+    search = serializers.CharField(required=False, allow_null=True, default=None, max_length=255)
+    federal_subject = serializers.ChoiceField(choices=card_tools.FEDERAL_SUBJECTS_NAMES, required=False,
+                                              allow_null=True, default=None)
+    federal_district = serializers.CharField(required=False, allow_null=True, default=None, max_length=255)
+    properties = CardPropertyFilterSerializer(required=False, default=dict)
+
+    def validate_search(self, value):
+        if value is None:
+            return None
+        tokens = card_tools.search_tokens(value)
+        if not tokens:
+            raise ValidateError("Строка поиска должна содержать буквы или цифры")
+        return tokens
+
+    def validate_cursor(self, value):
+        if value is None:
+            return None
+        try:
+            return card_tools.decode_cursor(value)
+        except signing.BadSignature:
+            raise ValidateError("Некорректный курсор")
+
+    def validate(self, attrs):
+        cursor = attrs["cursor"]
+        if cursor is None:
+            return attrs
+
+        if attrs["offset"]:
+            raise ValidateError("Параметры cursor и offset не могут быть заданы одновременно")
+
+        if attrs["search"] is not None:
+            raise ValidateError("Параметры cursor и search не могут быть заданы одновременно")
+
+        sorted_by = [[item["field_name"], item["reverse"]] for item in attrs["sorted_by"] or ()]
+        if cursor["sorted_by"] != sorted_by:
+            raise ValidateError("Курсор получен для другого порядка сортировки (sorted_by)")
+
+        return attrs
 
     def create(self, validated_data):
         ctx = context.CurrentContext()
@@ -214,3 +395,77 @@ class ShowCardSerializer(serializers.Serializer):
 
         ctx.response = Card.objects.card_info(user, **validated_data)
         return user
+
+
+class ExportCardSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Card.StatusChoice.choices, required=False, allow_null=True, default=None)
+    federal_subject = serializers.ChoiceField(choices=card_tools.FEDERAL_SUBJECTS_NAMES, required=False,
+                                              allow_null=True, default=None)
+    modified_from = serializers.DateTimeField(required=False, allow_null=True, default=None)
+    modified_to = serializers.DateTimeField(required=False, allow_null=True, default=None)
+
+    content_type = "application/x-ndjson"
+
+    def validate(self, attrs):
+        modified_from, modified_to = attrs["modified_from"], attrs["modified_to"]
+        if modified_from is not None and modified_to is not None and modified_from > modified_to:
+            raise ValidateError("Начало периода изменения не может быть позже его конца")
+
+        return attrs
+
+    def get_stream(self):
+        # поля карточек содержат даты и uuid, поэтому кодировщик Django, а не ujson
+        for chunk in Card.objects.export(**self.validated_data):
+            yield "".join(json.dumps(card, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+                          for card in chunk).encode("UTF-8")
+
+
+class CardChangesSerializer(serializers.Serializer):
+    since = serializers.CharField(required=False, allow_null=True, default=None, max_length=64)
+    displayed_fields = serializers.ListField(child=serializers.ChoiceField(choices=card_tools.displayed_fields),
+                                             required=False, allow_empty=True, max_length=100)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, required=False, default=100)
+    only_owned = OwnedCardField(required=False, default={"as_executor": True, "as_inspector": False})
+
+    def validate_since(self, value):
+        if value is None:
+            return None
+        try:
+            return card_tools.decode_watermark(value)
+        except ValueError:
+            raise ValidateError("Некорректная отметка синхронизации")
+
+    def create(self, validated_data):
+        ctx = context.CurrentContext()
+        user = ctx.user
+
+        ctx.response = Card.objects.changes(user, **validated_data)
+        return user
+
+
+class CardStatisticsSerializer(serializers.Serializer):
+    group_by = serializers.ListField(child=serializers.ChoiceField(choices=card_tools.statistics_fields),
+                                     required=False, allow_empty=True, max_length=4, default=list)
+    status = serializers.ChoiceField(choices=Card.StatusChoice.choices, required=False, allow_null=True, default=None)
+    federal_subject = serializers.ChoiceField(choices=card_tools.FEDERAL_SUBJECTS_NAMES, required=False,
+                                              allow_null=True, default=None)
+    federal_district = serializers.CharField(required=False, allow_null=True, default=None, max_length=255)
+    month_from = serializers.DateField(required=False, allow_null=True, default=None)
+    month_to = serializers.DateField(required=False, allow_null=True, default=None)
+
+    def validate_group_by(self, value):
+        if len(set(value)) != len(value):
+            raise ValidateError("Поля группировки не должны повторяться")
+        return value
+
+    def validate(self, attrs):
+        month_from, month_to = attrs["month_from"], attrs["month_to"]
+        if month_from is not None and month_to is not None and month_from > month_to:
+            raise ValidateError("Начало периода не может быть позже его конца")
+
+        return attrs
+
+    def create(self, validated_data):
+        ctx = context.CurrentContext()
+        ctx.response = {"groups": CardStatistics.objects.summary(**validated_data)}
+        return ctx.user
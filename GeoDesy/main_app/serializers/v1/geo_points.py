@@ -1,9 +1,17 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from rest_framework import serializers
+import json
+import config
+from utils.algorithms import serialize_to_json
+from utils import context
 from utils.geo import Coord, Geometry
-from main_app.models import GeoPoint
+from utils.map_tiles import tile_bounds, encode_tile, tile_hash
+from main_app.exceptions import ValidateError
+from main_app.models import GeoPoint, Card
+from main_app.db.clusters import MapClusterCache
 
 __all__ = (
-    "GeoPointSerializer",
+    "GeoPointSerializer", "GeoClusterSerializer", "GeoTileSerializer"
 )
 
 
@@ -11,8 +19,38 @@ class GeoPointSerializer(serializers.Serializer):
     latitude = serializers.FloatField(min_value=-90, max_value=90)
     longitude = serializers.FloatField(min_value=-180, max_value=180)
     radius = serializers.FloatField(min_value=10, max_value=40000)
+    nearest = serializers.IntegerField(min_value=1, max_value=1000, required=False, default=None, allow_null=True)
+    stream = serializers.ChoiceField(choices=("json", "ndjson"), required=False, default=None, allow_null=True)
+
+    _stream_content_types = {
+        "json": "application/json",
+        "ndjson": "application/x-ndjson",
+    }
+
+    @staticmethod
+    def _point_to_dict(point):
+        return {
+            "latitude": point.latitude,
+            "longitude": point.longitude,
+            "guid": point.guid
+        }
+
+    def _create_nearest_response(self, validated_data):
+        points = GeoPoint.objects.nearest(validated_data["latitude"], validated_data["longitude"],
+                                          validated_data["nearest"], validated_data["radius"])
+
+        response = []
+        for point in points:
+            item = self._point_to_dict(point)
+            item["distance"] = round(point.distance, 2)
+            response.append(item)
+
+        return response
 
     def _create_response(self, validated_data):
+        if validated_data["nearest"] is not None:
+            return self._create_nearest_response(validated_data)
+
         latitude = validated_data["latitude"]
         longitude = validated_data["longitude"]
         radius = validated_data["radius"]
@@ -23,16 +61,150 @@ class GeoPointSerializer(serializers.Serializer):
 
         response = []
         for point in points:
-            response.append(
-                {
-                    "latitude": point.latitude,
-                    "longitude": point.longitude,
-                    "guid": point.guid
-                }
-            )
+            response.append(self._point_to_dict(point))
 
         return response
 
     def get_response(self):
         response = self._create_response(self.validated_data)
         return response
+
+    def _iter_chunks(self, validated_data):
+        if validated_data["nearest"] is not None:
+            items = self._create_nearest_response(validated_data)
+            for item in items:
+                item["guid"] = str(item["guid"])
+            yield items
+            return
+
+        coord = Coord(latitude=validated_data["latitude"], longitude=validated_data["longitude"])
+        precision = Geometry.get_precision_by_length(length=validated_data["radius"])
+        boxes = Geometry.bounding_boxes(coord, precision)
+        for rows in GeoPoint.objects.in_boxes_chunks(boxes, config.MAP_STREAM_CHUNK_SIZE):
+            yield [{"latitude": latitude, "longitude": longitude, "guid": str(guid)}
+                   for guid, latitude, longitude in rows]
+
+    def _iter_ndjson(self, chunks):
+        for items in chunks:
+            if items:
+                yield b"".join(serialize_to_json(item) + b"\n" for item in items)
+
+    def _iter_json_array(self, chunks):
+        yield b"["
+        separator = b""
+        for items in chunks:
+            if items:
+                yield separator + b",".join(serialize_to_json(item) for item in items)
+                separator = b","
+        yield b"]"
+
+    def get_stream_content_type(self):
+        return self._stream_content_types[self.validated_data["stream"]]
+
+    def get_stream(self):
+        """
+        Генератор частей ответа в формате stream: JSON-массив или NDJSON (по объекту на строку).
+        Точки читаются из БД частями по MAP_STREAM_CHUNK_SIZE по мере отправки ответа.
+        """
+        chunks = self._iter_chunks(self.validated_data)
+        if self.validated_data["stream"] == "ndjson":
+            return self._iter_ndjson(chunks)
+        return self._iter_json_array(chunks)
+
+
+class GeoClusterSerializer(serializers.Serializer):
+    min_latitude = serializers.FloatField(min_value=-90, max_value=90)
+    max_latitude = serializers.FloatField(min_value=-90, max_value=90)
+    min_longitude = serializers.FloatField(min_value=-180, max_value=180)
+    max_longitude = serializers.FloatField(min_value=-180, max_value=180)
+    zoom = serializers.IntegerField(min_value=0, max_value=config.MAP_MAX_ZOOM)
+
+    def validate(self, attrs):
+        if attrs["min_latitude"] > attrs["max_latitude"]:
+            raise ValidateError("Минимальная широта не может быть больше максимальной")
+        return attrs
+
+    @staticmethod
+    def _get_boxes(validated_data):
+        min_lat, max_lat = validated_data["min_latitude"], validated_data["max_latitude"]
+        min_lon, max_lon = validated_data["min_longitude"], validated_data["max_longitude"]
+        if min_lon <= max_lon:
+            return [(min_lat, max_lat, min_lon, max_lon)]
+
+        # область просмотра пересекает 180-й меридиан
+        return [(min_lat, max_lat, min_lon, 180), (min_lat, max_lat, -180, max_lon)]
+
+    def _create_response(self, validated_data):
+        zoom = validated_data["zoom"]
+        boxes = self._get_boxes(validated_data)
+        cluster_cache = MapClusterCache()
+        level = cluster_cache.get_level(boxes, zoom)
+        clusters = cluster_cache.get_clusters(boxes, level)
+
+        user = context.CurrentContext().user
+        if user is None or not user.is_staff:
+            # в списке карточек остальным пользователям доступны только принятые карточки
+            clusters = [cluster | {"statuses": {status: count for status, count in cluster["statuses"].items()
+                                                if status == Card.SuccessChoice.SUCCESS}}
+                        for cluster in clusters]
+
+        points = []
+        if zoom >= config.MAP_CLUSTER_POINTS_ZOOM and \
+                sum(cluster["count"] for cluster in clusters) <= config.MAP_CLUSTER_MAX_POINTS:
+            points = [GeoPointSerializer._point_to_dict(point) for point in GeoPoint.objects.in_boxes(boxes)]
+            clusters = []
+
+        return {
+            "zoom": zoom,
+            "level": level,
+            "clusters": clusters,
+            "points": points,
+        }
+
+    def get_response(self):
+        response = self._create_response(self.validated_data)
+        return response
+
+
+class GeoTileSerializer(serializers.Serializer):
+    z = serializers.IntegerField(min_value=config.MAP_TILE_MIN_ZOOM, max_value=config.MAP_MAX_ZOOM)
+    x = serializers.IntegerField(min_value=0)
+    y = serializers.IntegerField(min_value=0)
+
+    def validate(self, attrs):
+        count = 1 << attrs["z"]
+        if attrs["x"] >= count or attrs["y"] >= count:
+            raise ValidateError(f"Номера тайла на уровне {attrs['z']} должны быть меньше {count}")
+        return attrs
+
+    @staticmethod
+    def _row_to_dict(row):
+        guid, latitude, longitude, subject_id = row
+        return {
+            "latitude": latitude,
+            "longitude": longitude,
+            "guid": guid,
+            "subject_id": subject_id
+        }
+
+    def get_response(self, media_format):
+        """
+        Возвращает содержимое тайла в формате media_format ("tile" - двоичный, иначе JSON) и его ETag.
+        ETag вычисляется по содержимому в этом формате: двоичный тайл хранит координаты с шагом
+        1 / MAP_TILE_COORD_SCALE градуса, а JSON - с точностью базы, и меньший шага сдвиг точки
+        должен менять ETag JSON.
+        """
+        z, x, y = self.validated_data["z"], self.validated_data["x"], self.validated_data["y"]
+        rows = GeoPoint.objects.tile_rows(tile_bounds(z, x, y))
+        if media_format == "tile":
+            data = encode_tile(z, x, y, rows)
+            return data, f'"{tile_hash(data)}"'
+
+        response = {
+            "z": z,
+            "x": x,
+            "y": y,
+            "points": [self._row_to_dict(row) for row in rows]
+        }
+        data = json.dumps(response, cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+        return response, f'"{tile_hash(data)}-json"'
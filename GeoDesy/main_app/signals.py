@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.db.models import Q
+from main_app.models import GeoPoint, GeoPointTombstone, Card, Photo, CardTombstone, CardListing, User
+from main_app.db.spatial import SpatialIndexCache
+from main_app.db.clusters import MapClusterCache
+from utils.spatial_index import SPATIAL_INDEX_COLUMNS
+
+__all__ = (
+    "geopoint_saved", "geopoint_deleted", "geopoint_tombstone", "geopoint_clusters_changed", "card_clusters_changed",
+    "card_changed", "card_deleted", "card_photo_changed", "card_coordinates_changed", "card_listing_changed",
+    "card_owner_changed"
+)
+
+
+@receiver(post_save, sender=GeoPoint)
+def geopoint_saved(sender, instance, **kwargs):
+    cache = SpatialIndexCache()
+    if not cache.enabled:
+        return
+
+    row = tuple(getattr(instance, field) for field in SPATIAL_INDEX_COLUMNS)
+    cache.notify("save", instance.guid)
+    transaction.on_commit(lambda: cache.apply_saved(row))
+
+
+@receiver(post_delete, sender=GeoPoint)
+def geopoint_deleted(sender, instance, **kwargs):
+    cache = SpatialIndexCache()
+    if not cache.enabled:
+        return
+
+    guid = instance.guid
+    cache.notify("delete", guid)
+    transaction.on_commit(lambda: cache.apply_deleted(guid))
+
+
+@receiver(post_delete, sender=GeoPoint)
+def geopoint_tombstone(sender, instance, **kwargs):
+    # снимок индекса мог быть создан до удаления: процессы скрывают в нем точки по этим записям
+    GeoPointTombstone.objects.update_or_create(guid=instance.guid)
+
+
+@receiver(post_save, sender=GeoPoint)
+@receiver(post_delete, sender=GeoPoint)
+def geopoint_clusters_changed(sender, instance, **kwargs):
+    cell = instance.cell
+    transaction.on_commit(lambda: MapClusterCache().invalidate([cell]))
+
+
+@receiver(post_save, sender=Card)
+@receiver(post_delete, sender=Card)
+def card_clusters_changed(sender, instance, **kwargs):
+    cell = instance.coordinates.cell
+    transaction.on_commit(lambda: MapClusterCache().invalidate([cell]))
+
+
+@receiver(post_save, sender=Card)
+@receiver(post_delete, sender=Card)
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+@receiver(post_save, sender=GeoPoint)
+@receiver(post_delete, sender=GeoPoint)
+def card_changed(sender, instance, **kwargs):
+    Card.objects.cards_changed()
+
+
+@receiver(post_delete, sender=Card)
+def card_deleted(sender, instance, **kwargs):
+    change_xid, change_seq = Card.objects.get_change_mark()
+    # по состоянию карточки на момент удаления лента изменений определяет, кому она была видна
+    CardTombstone.objects.update_or_create(card_uuid=instance.card_uuid, defaults={
+        "change_xid": change_xid, "change_seq": change_seq, "status": instance.status,
+        "executor_id": instance.executor_id, "inspector_id": instance.inspector_id,
+        "unpublished_xid": instance.unpublished_xid, "unpublished_seq": instance.unpublished_seq,
+        "previous_inspector_id": instance.previous_inspector_id,
+    })
+
+
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+def card_photo_changed(sender, instance, **kwargs):
+    Card.objects.filter(card_uuid=instance.card_ref_id).mark_changed()
+
+
+@receiver(post_save, sender=GeoPoint)
+def card_coordinates_changed(sender, instance, created, **kwargs):
+    # координаты и субъект точки выводятся в карточках, поэтому изменение точки - изменение ее карточек
+    if not created:
+        Card.objects.filter(coordinates=instance).mark_changed()
+
+
+@receiver(post_save, sender=Card)
+@receiver(post_delete, sender=Card)
+def card_listing_changed(sender, instance, **kwargs):
+    CardListing.objects.refresh([instance.card_uuid])
+
+
+@receiver(post_save, sender=User)
+def card_owner_changed(sender, instance, created, update_fields=None, **kwargs):
+    # в витрине списка карточек хранятся имена и email владельцев; вход пользователя их не меняет
+    owner_fields = {"first_name", "second_name", "third_name", "email"}
+    if created or update_fields is not None and not owner_fields.intersection(update_fields):
+        return
+
+    card_uuids = Card.objects.filter(Q(executor=instance) | Q(inspector=instance)).values_list("card_uuid", flat=True)
+    CardListing.objects.refresh(card_uuids)
+    # имена владельцев выводятся и в закэшированных ответах card_info
+    Card.objects.cards_changed()
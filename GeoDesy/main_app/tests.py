@@ -1,5 +1,198 @@
-from django.test import TestCase
+import random
+import uuid
+from django.test import SimpleTestCase, TestCase, override_settings
+from config import MAP_TILE_COORD_SCALE, CARD_CACHE_ALIAS
+from main_app.management.commands.card_query_plans import SEED_CARDS, _seed, _explain, _find_seq_scans, \
+    get_scenario_queries
+from main_app.models import GeoPoint, Card, CardListing, Photo
+from utils import card_tools
+from utils.map_tiles import tile_bounds, in_tile, encode_tile, decode_tile, tile_hash
 
-# Create your tests here.
-# P.S: No no no...
 
+# кэш ответов card_info отключен: каждый вызов выполняет запросы
+NO_CARD_CACHE = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    CARD_CACHE_ALIAS: {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+}
+NOT_OWNED = {"as_executor": False, "as_inspector": False}
+
+
+class MapTileTests(SimpleTestCase):
+    # квант координат двоичного тайла, градусы
+    QUANTUM = 1 / MAP_TILE_COORD_SCALE
+
+    @staticmethod
+    def _random_rows(z, x, y, count, seed=0):
+        rnd = random.Random(seed)
+        min_lat, max_lat, min_lon, max_lon = tile_bounds(z, x, y)
+        rows = []
+        for _ in range(count):
+            latitude = round(rnd.uniform(min_lat, max_lat), 8)
+            longitude = round(rnd.uniform(min_lon, max_lon), 8)
+            rows.append((uuid.UUID(int=rnd.getrandbits(128)), latitude, longitude, rnd.randint(1, 89)))
+        return sorted(rows, key=lambda row: (row[1], row[2]))
+
+    def assertRoundTrip(self, z, x, y, rows):
+        tile = decode_tile(encode_tile(z, x, y, rows))
+        self.assertEqual((tile["z"], tile["x"], tile["y"]), (z, x, y))
+        self.assertEqual(len(tile["points"]), len(rows))
+        for (guid, latitude, longitude, subject_id), decoded in zip(rows, tile["points"]):
+            self.assertEqual(decoded[0], guid)
+            self.assertEqual(decoded[3], subject_id)
+            self.assertLessEqual(abs(decoded[1] - latitude), self.QUANTUM)
+            self.assertLessEqual(abs(decoded[2] - longitude), self.QUANTUM)
+
+    def test_round_trip(self):
+        z, x, y = 12, 2470, 1280
+        self.assertRoundTrip(z, x, y, self._random_rows(z, x, y, 500))
+
+    def test_stable_hash(self):
+        z, x, y = 12, 2470, 1280
+        rows = self._random_rows(z, x, y, 50)
+        self.assertEqual(tile_hash(encode_tile(z, x, y, rows)), tile_hash(encode_tile(z, x, y, list(rows))))
+        moved = [(rows[0][0], rows[0][1] + 2 * self.QUANTUM, *rows[0][2:]), *rows[1:]]
+        self.assertNotEqual(tile_hash(encode_tile(z, x, y, rows)), tile_hash(encode_tile(z, x, y, moved)))
+
+    def test_empty_tile(self):
+        tile = decode_tile(encode_tile(10, 600, 300, []))
+        self.assertEqual(tile, {"z": 10, "x": 600, "y": 300, "points": []})
+
+    def test_tile_edges(self):
+        z, x, y = 10, 600, 300
+        bounds = tile_bounds(z, x, y)
+        min_lat, max_lat, min_lon, max_lon = bounds
+        # нижняя и левая границы принадлежат тайлу, верхняя и правая - соседним
+        self.assertTrue(in_tile(bounds, min_lat, min_lon))
+        self.assertFalse(in_tile(bounds, max_lat, (min_lon + max_lon) / 2))
+        self.assertFalse(in_tile(bounds, (min_lat + max_lat) / 2, max_lon))
+        self.assertTrue(in_tile(tile_bounds(z, x, y - 1), max_lat, (min_lon + max_lon) / 2))
+        self.assertTrue(in_tile(tile_bounds(z, x + 1, y), (min_lat + max_lat) / 2, max_lon))
+
+        # общий угол четырех тайлов принадлежит ровно одному из них
+        tiles = [(x, y), (x + 1, y), (x, y - 1), (x + 1, y - 1)]
+        owners = [tile for tile in tiles if in_tile(tile_bounds(z, *tile), max_lat, max_lon)]
+        self.assertEqual(owners, [(x + 1, y - 1)])
+
+        rows = [(uuid.uuid4(), min_lat, min_lon, 1), (uuid.uuid4(), min_lat, max_lon - self.QUANTUM, 2),
+                (uuid.uuid4(), max_lat - self.QUANTUM, min_lon, 3)]
+        self.assertRoundTrip(z, x, y, rows)
+
+    def test_map_edges(self):
+        z = 8
+        count = 1 << z
+        # на краях карты (полюс, 180°) верхняя и правая границы включаются
+        self.assertTrue(in_tile(tile_bounds(z, count - 1, 0), 90.0, 180.0))
+        self.assertTrue(in_tile(tile_bounds(z, 0, count - 1), -90.0, -180.0))
+
+    def test_antimeridian(self):
+        z, y = 8, 100
+        count = 1 << z
+        west, east = tile_bounds(z, 0, y), tile_bounds(z, count - 1, y)
+        self.assertEqual(west[2], -180.0)
+        self.assertEqual(east[3], 180.0)
+        latitude = (west[0] + west[1]) / 2
+        self.assertTrue(in_tile(west, latitude, -180.0))
+        self.assertTrue(in_tile(east, latitude, 180.0))
+        self.assertTrue(in_tile(east, latitude, 179.9999999))
+        self.assertFalse(in_tile(west, latitude, 179.9999999))
+        self.assertFalse(in_tile(east, latitude, -180.0))
+
+        self.assertRoundTrip(z, 0, y, [(uuid.uuid4(), latitude, -180.0, 87),
+                                       (uuid.uuid4(), latitude, -179.9999999, 87)])
+        self.assertRoundTrip(z, count - 1, y, [(uuid.uuid4(), latitude, 179.9999999, 87),
+                                               (uuid.uuid4(), latitude, 180.0, 87)])
+
+
+class NearbyPointsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rnd = random.Random(0)
+        for _ in range(200):
+            GeoPoint(guid=uuid.UUID(int=rnd.getrandbits(128)), latitude=round(rnd.uniform(50, 60), 8),
+                     longitude=round(rnd.uniform(30, 40), 8), subject_id=77).save()
+
+        # пункты Чукотки по обе стороны меридиана 180°
+        cls.east = GeoPoint(guid=uuid.uuid4(), latitude=66.0, longitude=179.9999, subject_id=87)
+        cls.west = GeoPoint(guid=uuid.uuid4(), latitude=66.0, longitude=-179.9999, subject_id=87)
+        cls.east.save()
+        cls.west.save()
+
+    def assertIndexScan(self, points):
+        plan = _explain(points.raw_query, points.params)
+        self.assertFalse(_find_seq_scans(plan, GeoPoint._meta.db_table), plan)
+
+    def test_index_scan(self):
+        points = GeoPoint.objects.nearby_points(55.0, 35.0, 0.5)
+        self.assertIndexScan(points)
+        # прямоугольник поиска по долготе шире, чем по широте (сходимость меридианов)
+        inner = GeoPoint.objects.filter(latitude__range=(54.5, 55.5), longitude__range=(34.5, 35.5))
+        found = {point.guid for point in points}
+        self.assertTrue(inner.exists())
+        self.assertLessEqual(set(inner.values_list("guid", flat=True)), found)
+        self.assertTrue(all(abs(point.latitude - 55.0) <= 0.5 for point in points))
+
+    def test_antimeridian(self):
+        for longitude in (179.99995, -179.99995):
+            points = GeoPoint.objects.nearby_points(66.0, longitude, 0.001)
+            self.assertIndexScan(points)
+            self.assertEqual({point.guid for point in points}, {self.east.guid, self.west.guid})
+
+
+@override_settings(CACHES=NO_CARD_CACHE)
+class CardInfoQueriesTests(TestCase):
+    # поля, которые есть в витрине списка (CardListing)
+    LISTING_FIELDS = ["status", "datetime_creation", "latitude", "longitude", "federal_subject",
+                      "federal_district", "executor", "inspector"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.executor, cls.inspector = _seed(300)
+        cards = list(Card.objects.order_by("card_uuid").values_list("card_uuid", flat=True)[:60])
+        Photo.objects.bulk_create(Photo(path=f"photos/test/{i}.jpg", card_ref_id=card_uuid)
+                                  for i, card_uuid in enumerate(cards * 2))
+        CardListing.objects.refresh(cards)
+
+    def card_info(self, user, limit, **kwargs):
+        return Card.objects.card_info(user, only_owned=NOT_OWNED, cards=[], geopoints=[], sorted_by=[], limit=limit,
+                                      offset=0, **kwargs)
+
+    def test_listing_path(self):
+        # число карточек и страница из витрины, без соединений и запросов на каждую карточку
+        for user in (self.inspector, self.executor):
+            for limit in (5, 50):
+                with self.assertNumQueries(2):
+                    result = self.card_info(user, limit, displayed_fields=self.LISTING_FIELDS)
+                self.assertEqual(len(result["cards"]), limit)
+
+        with self.assertNumQueries(1):
+            self.card_info(self.inspector, 50, displayed_fields=self.LISTING_FIELDS, count_mode="none")
+
+    def test_fallback_path(self):
+        # все поля (с фотографиями) и фильтр по состоянию пункта читаются из карточек:
+        # число карточек, страница со связанными таблицами, фотографии страницы
+        properties = {"trench": [value for value, _ in card_tools.ReadingPropertyChoice.choices]}
+        for user in (self.inspector, self.executor):
+            for limit in (5, 50):
+                with self.assertNumQueries(3):
+                    result = self.card_info(user, limit)
+                self.assertEqual(len(result["cards"]), limit)
+
+                with self.assertNumQueries(2):
+                    result = self.card_info(user, limit, displayed_fields=self.LISTING_FIELDS, properties=properties)
+                self.assertEqual(len(result["cards"]), limit)
+
+        result = self.card_info(self.inspector, 300)
+        self.assertTrue(any(card["photos"] for card in result["cards"]))
+
+
+class CardQueryPlansTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.executor, cls.inspector = _seed(SEED_CARDS)
+
+    def test_no_seq_scans(self):
+        # ни одна страница списка карточек (из карточек или витрины) не читает таблицу целиком
+        for description, query, table in get_scenario_queries(self.executor, self.inspector, 100):
+            with self.subTest(description):
+                plan = _explain(*query.query.sql_with_params())
+                self.assertFalse(_find_seq_scans(plan, table), plan)
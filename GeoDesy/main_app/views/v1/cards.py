@@ -5,15 +5,18 @@ from main_app.views.base_view import BaseApiView
 from main_app.views.v1.JWT import JWTAuthenticationAPIView
 from utils.context import CurrentContext
 from utils.upload_files.parsers import LimitedMultiPartParser
-from django.http import HttpResponseNotFound, HttpResponse
+from django.http import HttpResponseNotFound, HttpResponse, StreamingHttpResponse
 
 from main_app.models import Card, FederalSubject
+from main_app.db import caches
 from utils.pdf import CardPDF
 
 from ajax_select import register, LookupChannel
 
 __all__ = (
-    "CreateCardAPIView", "UpdateCardAPIView", "ShowCardAPIView", "DownloadCardPDF", "FederalSubjectLookup"
+    "CreateCardAPIView", "CreateCardBatchAPIView", "UpdateCardAPIView", "UpdateCardBatchAPIView", "ShowCardAPIView",
+    "ShowCardCacheStatsAPIView", "ExportCardAPIView", "CardChangesAPIView", "CardStatisticsAPIView", "DownloadCardPDF",
+    "FederalSubjectLookup"
 )
 
 
@@ -34,6 +37,17 @@ class CreateCardAPIView(JWTAuthenticationAPIView):
         return Response()
 
 
+class CreateCardBatchAPIView(JWTAuthenticationAPIView):
+    parser_classes = (LimitedMultiPartParser,)
+
+    def post(self, request):
+        serializer = cards.CreateCardBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        ctx = CurrentContext()
+        return Response(ctx.response)
+
+
 class UpdateCardAPIView(JWTAuthenticationAPIView):
     permission_classes = (StaffOnlyPermission,)
 
@@ -41,7 +55,19 @@ class UpdateCardAPIView(JWTAuthenticationAPIView):
         serializer = cards.UpdateCardForStuffSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        return Response()
+        ctx = CurrentContext()
+        return Response(ctx.response)
+
+
+class UpdateCardBatchAPIView(JWTAuthenticationAPIView):
+    permission_classes = (StaffOnlyPermission,)
+
+    def post(self, request):
+        serializer = cards.UpdateCardBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        ctx = CurrentContext()
+        return Response(ctx.response)
 
 
 class ShowCardAPIView(JWTAuthenticationAPIView):
@@ -54,6 +80,46 @@ class ShowCardAPIView(JWTAuthenticationAPIView):
         return Response(ctx.response)
 
 
+class CardChangesAPIView(JWTAuthenticationAPIView):
+
+    def post(self, request):
+        serializer = cards.CardChangesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        ctx = CurrentContext()
+        return Response(ctx.response)
+
+
+class ShowCardCacheStatsAPIView(JWTAuthenticationAPIView):
+    permission_classes = (StaffOnlyPermission,)
+
+    def get(self, request):
+        return Response({
+            "responses": caches.card_responses.stats(),
+            "counts": caches.card_counts.stats(),
+        })
+
+
+class ExportCardAPIView(JWTAuthenticationAPIView):
+    permission_classes = (StaffOnlyPermission,)
+
+    def post(self, request):
+        serializer = cards.ExportCardSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return StreamingHttpResponse(serializer.get_stream(), content_type=serializer.content_type)
+
+
+class CardStatisticsAPIView(JWTAuthenticationAPIView):
+    permission_classes = (StaffOnlyPermission,)
+
+    def post(self, request):
+        serializer = cards.CardStatisticsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        ctx = CurrentContext()
+        return Response(ctx.response)
+
+
 class DownloadCardPDF(BaseApiView):
     def get(self, request, card_uuid):
         try:
@@ -1,10 +1,19 @@
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from main_app.serializers.v1 import geo_points
-
+from main_app.db.spatial import SpatialIndexCache
+from main_app.auth import OptionalJWTAuthentication
+from main_app.permissions import StaffOnlyPermission
+from main_app.renderers import MapTileRenderer
 from main_app.views.base_view import BaseApiView
+from main_app.views.v1.JWT import JWTAuthenticationAPIView
 
 __all__ = (
-    "GeoPointAPIView",
+    "GeoPointAPIView", "GeoClusterAPIView", "GeoTileAPIView", "GeoPointIndexStatsAPIView"
 )
 
 
@@ -13,4 +22,49 @@ class GeoPointAPIView(BaseApiView):
     def post(self, request):
         serializer = geo_points.GeoPointSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        if serializer.validated_data["stream"] is not None:
+            return StreamingHttpResponse(serializer.get_stream(), content_type=serializer.get_stream_content_type())
         return Response(serializer.get_response())
+
+
+class GeoClusterAPIView(BaseApiView):
+    authentication_classes = (OptionalJWTAuthentication,)
+
+    def post(self, request):
+        serializer = geo_points.GeoClusterSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.get_response())
+
+
+class GeoTileAPIView(BaseApiView):
+    renderer_classes = (JSONRenderer, MapTileRenderer)
+
+    def get(self, request, z, x, y):
+        serializer = geo_points.GeoTileSerializer(data={"z": z, "x": x, "y": y})
+        serializer.is_valid(raise_exception=True)
+        data, etag = serializer.get_response(request.accepted_renderer.format)
+
+        # слабое сравнение, как в условных запросах Django: префикс W/ не учитывается
+        etags = [tag.removeprefix("W/") for tag in parse_etags(request.headers.get("If-None-Match", ""))]
+        if "*" in etags or etag in etags:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Accept",))
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if getattr(response, "exception", False):
+            # ошибки отдаются в JSON независимо от запрошенного формата
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class GeoPointIndexStatsAPIView(JWTAuthenticationAPIView):
+    permission_classes = (StaffOnlyPermission,)
+
+    def get(self, request):
+        return Response(SpatialIndexCache().stats())
@@ -1,3 +1,5 @@
 from utils.card_tools.data import *
 from utils.card_tools.choices import *
 from utils.card_tools.representation_tools import *
+from utils.card_tools.cursors import *
+from utils.card_tools.search import *
@@ -0,0 +1,63 @@
+import json
+import uuid
+from datetime import date, datetime
+from django.core import signing
+
+__all__ = ("encode_cursor", "decode_cursor", "encode_watermark", "decode_watermark")
+
+_CURSOR_SALT = "card_tools.cursors"
+
+
+def _to_json(value):
+    # полная точность времени важна: курсор сравнивается со значениями в БД на равенство
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Тип {type(value).__name__} не поддерживается в курсоре")
+
+
+class _CursorSerializer:
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(",", ":"), default=_to_json).encode("latin-1")
+
+    def loads(self, data):
+        return json.loads(data.decode("latin-1"))
+
+
+def encode_cursor(sorted_by, values, backwards=False) -> str:
+    """
+    Подписанный курсор позиции в списке карточек.
+    sorted_by - список пар (поле, по убыванию) без card_uuid, values - значения полей сортировки и card_uuid
+    граничной карточки, backwards - направление чтения от позиции (к началу списка).
+    """
+    payload = {"sorted_by": [list(item) for item in sorted_by], "values": list(values), "backwards": backwards}
+    return signing.dumps(payload, salt=_CURSOR_SALT, serializer=_CursorSerializer, compress=True)
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Проверяет подпись курсора и возвращает его содержимое; при ошибке вызывает signing.BadSignature.
+    Значения полей возвращаются в виде из JSON (строки для времени и uuid).
+    """
+    return signing.loads(cursor, salt=_CURSOR_SALT, serializer=_CursorSerializer)
+
+
+def encode_watermark(mark) -> str:
+    """
+    Отметка синхронизации карточек (см. CardQueryset.changes): пара (транзакция, номер изменения).
+    Не подписывается: подмена отметки влияет только на полноту ответа самому клиенту.
+    """
+    xid, seq = mark
+    return f"{xid}.{seq}"
+
+
+def decode_watermark(watermark: str) -> tuple[int, int]:
+    """
+    Разбирает отметку encode_watermark; при ошибке вызывает ValueError.
+    """
+    xid, seq = watermark.split(".")
+    mark = int(xid), int(seq)
+    if min(mark) < 0:
+        raise ValueError(watermark)
+    return mark
@@ -1,7 +1,8 @@
 __all__ = (
     "displayed_Card_fields", "displayed_GeoPoint_fields", "displayed_Photo_fields", "owners", "sorted_fields",
     "mapper_related_GeoPoint_fields", "mapper_related_Federal_fields", "mapper_related_fields",
-    "reverse_mapper_related_fields", "displayed_fields", "CardData", "FEDERAL_SUBJECTS_DICT", "FEDERAL_SUBJECTS_NAMES",
+    "reverse_mapper_related_fields", "owner_fields", "owner_staff_fields", "displayed_fields", "property_fields",
+    "statistics_fields", "CardData", "FEDERAL_SUBJECTS_DICT", "FEDERAL_SUBJECTS_NAMES",
     "FEDERAL_SUBJECTS_CODES"
 )
 
@@ -20,7 +21,7 @@ displayed_Card_fields = {"status", "execute_date", "identification_pillar",
                          "sign_height",
                          "outdoor_sign", "ORP_one", "ORP_two", "trench", "satellite_surveillance", "type_of_sign",
                          "point_index", "name_point", "year_of_laying", "type_of_center", "height_above_sea_level",
-                         "trapezoids", "datetime_creation", "datetime_inspection"}
+                         "trapezoids", "datetime_creation", "datetime_inspection", "version"}
 
 displayed_GeoPoint_fields = {"latitude", "longitude", "federal_subject", "federal_district"}
 displayed_Photo_fields = {"photos"}
@@ -28,6 +29,9 @@ owners = {"executor", "inspector"}
 
 sorted_fields = {"datetime_creation", "datetime_inspection"}
 
+# поля группировки статистики карточек (см. CardStatistics)
+statistics_fields = ("federal_subject", "federal_district", "status", "month")
+
 mapper_related_GeoPoint_fields = {"latitude": "coordinates__latitude", "longitude": "coordinates__longitude"}
 
 mapper_related_Federal_fields = {"federal_subject": "coordinates__subject__name",
@@ -41,8 +45,16 @@ reverse_mapper_related_fields = {"latitude": "coordinates__latitude", "longitude
                                  "federal_district": "coordinates__subject__district__name"
                                  }
 
+# поля владельцев карточки, выводимые в списке (как в User.to_dict); email - только сотрудникам
+owner_fields = ("first_name", "second_name", "third_name")
+owner_staff_fields = ("email",)
+
 displayed_fields = displayed_Card_fields | displayed_GeoPoint_fields | owners | displayed_Photo_fields
 
+# поля состояния пункта вида {"value": ..., ...}; по значению value каждого поля есть индекс (см. Card.Meta)
+property_fields = ("identification_pillar", "type_of_sign", "monolith_one", "monolith_two", "monolith_three_and_four",
+                   "outdoor_sign", "ORP_one", "ORP_two", "trench", "satellite_surveillance")
+
 FEDERAL_SUBJECTS_DICT = {'Белгородская область': 31, 'Брянская область': 32, 'Владимирская область': 33,
                          'Воронежская область': 36,
                          'Ивановская область': 37, 'Калужская область': 40, 'Костромская область': 44,
@@ -1,36 +1,34 @@
 from django.utils.formats import localize
-from utils.card_tools.data import displayed_fields, displayed_Card_fields, displayed_GeoPoint_fields, owners
+from utils.card_tools.data import displayed_Card_fields, displayed_GeoPoint_fields, owners, \
+    mapper_related_fields, owner_fields, owner_staff_fields
 from utils.card_tools.choices import TypeSignChoice
 
-__all__ = ("card_to_dict", "printable_type_of_sign", "printable_coordinates",
+__all__ = ("card_row_to_dict", "printable_type_of_sign", "printable_coordinates",
            "printable_sign_height_above_ground_level")
 
 
-def card_to_dict(user, card, allow_fields):
-    if allow_fields is None:
-        allow_fields = displayed_fields
-    else:
-        allow_fields = set(allow_fields)
-
+def card_row_to_dict(row, allow_fields, is_staff, photos=None):
+    """
+    Представление карточки из строки QuerySet.values() (см. CardQueryset._get_displayed_columns).
+    photos - словарь {card_uuid: список url фотографий}, нужен, если выводится поле photos.
+    """
     coordinates = {}
-    result = {"card_uuid": card.card_uuid}
-    card_fields = displayed_Card_fields
-    geo_fields = displayed_GeoPoint_fields
-    owner_fields = owners
+    result = {"card_uuid": row["card_uuid"]}
+    fields = owner_fields + owner_staff_fields if is_staff else owner_fields
     for field in allow_fields:
-        if field in card_fields:
-            result[field] = getattr(card, field)
-        elif field in owner_fields:
-            owner = getattr(card, field)
-            to_dict = getattr(owner, "to_dict", lambda x: None)
-            result[field] = to_dict(user.is_staff)
+        if field in displayed_Card_fields:
+            result[field] = row[field]
+        elif field in owners:
+            if row[f"{field}_id"] is None:
+                result[field] = None
+            else:
+                result[field] = {name: row[f"{field}__{name}"] for name in fields}
 
-        elif field in geo_fields:
-            geo_point = getattr(card, "coordinates")
-            coordinates[field] = getattr(geo_point, field)
+        elif field in displayed_GeoPoint_fields:
+            coordinates[field] = row[mapper_related_fields[field]]
 
         else:
-            result[field] = getattr(card, "photos_url")
+            result[field] = photos[row["card_uuid"]]
 
     if coordinates:
         result["coordinates"] = coordinates
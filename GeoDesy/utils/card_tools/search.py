@@ -0,0 +1,25 @@
+import re
+
+__all__ = ("search_tokens", "search_tsquery")
+
+# слова - последовательности букв и цифр, как в поисковом векторе карточки (см. Card.search_vector)
+_SEARCH_WORD = re.compile(r"[^\W_]+")
+
+
+def search_tokens(text: str, max_count: int = 16) -> list[str]:
+    """
+    Слова строки поиска в нижнем регистре, без повторов и не более max_count.
+    """
+    tokens = []
+    for token in _SEARCH_WORD.findall(text.lower()):
+        if token not in tokens:
+            tokens.append(token)
+    return tokens[:max_count]
+
+
+def search_tsquery(tokens) -> str:
+    """
+    Запрос tsquery (в синтаксисе to_tsquery): все слова должны встречаться, каждое - как начало слова карточки.
+    Слова содержат только буквы и цифры, поэтому экранирование не требуется.
+    """
+    return " & ".join(f"{token}:*" for token in tokens)
@@ -1,7 +1,8 @@
 import math
-from config import COORD_ROUND_SCALE
+import numpy as np
+from config import COORD_ROUND_SCALE, SPATIAL_CELL_LEVEL, SPATIAL_CELL_MAX_COVERING
 __all__ = (
-    "R", "Coord", "Point", "Geometry"
+    "R", "Coord", "Point", "CoordArray", "PointArray", "Geometry", "Cell", "get_unit_vector"
 )
 
 R = 6371300  # радиус Земли в метрах
@@ -61,6 +62,13 @@ class Coord:
         return self._deg_coord
 
 
+def get_unit_vector(latitude: float, longitude: float) -> tuple[float, float, float]:
+    # координаты (в градусах) точки на единичной сфере
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    cos_lat = math.cos(lat)
+    return cos_lat * math.cos(lon), cos_lat * math.sin(lon), math.sin(lat)
+
+
 def _get_point(coord: Coord):
     c = coord.radians
     x = R * math.cos(c.latitude) * math.cos(c.longitude)
@@ -90,6 +98,100 @@ class Point:
         return self.x * other.x + self.y * other.y + self.z * other.z
 
 
+class CoordArray:
+    """
+    Массив координат (в градусах и радианах) для пакетной обработки результатов выборки.
+    """
+
+    def __init__(self, latitudes, longitudes):
+        latitudes = np.round(np.asarray(latitudes, dtype=np.float64), COORD_ROUND_SCALE)
+        longitudes = np.round(np.asarray(longitudes, dtype=np.float64), COORD_ROUND_SCALE)
+        assert latitudes.shape == longitudes.shape, "Массивы широт и долгот должны иметь одинаковую длину"
+        assert np.all(np.abs(latitudes) <= 90) and np.all(np.abs(longitudes) <= 180)
+
+        self._degrees = (latitudes, longitudes)
+        self._radians = (np.radians(latitudes), np.radians(longitudes))
+
+    @classmethod
+    def from_objects(cls, objects):
+        # objects - последовательность объектов с атрибутами latitude и longitude (например, GeoPoint)
+        objects = list(objects)
+        count = len(objects)
+        latitudes = np.fromiter((obj.latitude for obj in objects), dtype=np.float64, count=count)
+        longitudes = np.fromiter((obj.longitude for obj in objects), dtype=np.float64, count=count)
+        return cls(latitudes, longitudes)
+
+    def __len__(self):
+        return len(self._degrees[0])
+
+    @property
+    def degrees(self):
+        return self._degrees
+
+    @property
+    def radians(self):
+        return self._radians
+
+
+class PointArray:
+    """
+    Массив точек в геоцентрических декартовых координатах (ECEF), строка - (x, y, z).
+    """
+
+    def __init__(self, coords: CoordArray):
+        latitudes, longitudes = coords.radians
+        cos_latitudes = np.cos(latitudes)
+        self._xyz = R * np.column_stack(
+            (cos_latitudes * np.cos(longitudes), cos_latitudes * np.sin(longitudes), np.sin(latitudes))
+        )
+
+    @classmethod
+    def from_unit_vectors(cls, xyz):
+        # xyz - массив формы (N, 3) с координатами на единичной сфере (например, GeoPoint.x/y/z)
+        obj = cls.__new__(cls)
+        obj._xyz = R * np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+        return obj
+
+    @classmethod
+    def from_objects(cls, objects):
+        # objects - последовательность объектов с атрибутами x, y, z на единичной сфере (например, GeoPoint)
+        objects = list(objects)
+        xyz = np.fromiter((c for obj in objects for c in (obj.x, obj.y, obj.z)), dtype=np.float64,
+                          count=3 * len(objects))
+        return cls.from_unit_vectors(xyz)
+
+    def __len__(self):
+        return len(self._xyz)
+
+    @property
+    def xyz(self):
+        return self._xyz
+
+    @staticmethod
+    def _as_vector(point: Point):
+        return np.array((point.x, point.y, point.z), dtype=np.float64)
+
+    def chord_distances(self, point: Point):
+        return np.linalg.norm(self._xyz - self._as_vector(point), axis=1)
+
+    def arc_distances(self, point: Point):
+        half_chord = np.minimum(self.chord_distances(point) / (2 * R), 1)
+        return 2 * R * np.arcsin(half_chord)
+
+    def nearest(self, point: Point, k: int = 1):
+        # Возвращает индексы и хордовые расстояния k ближайших точек в порядке возрастания расстояния.
+        # Ближайшим точкам соответствует наибольшее скалярное произведение: |a - b|^2 = 2R^2 - 2(a, b)
+        products = self._xyz @ self._as_vector(point)
+        k = min(k, len(products))
+        if k == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+
+        indexes = np.argpartition(-products, k - 1)[:k]
+        indexes = indexes[np.argsort(-products[indexes], kind="stable")]
+        distances = np.sqrt(np.maximum(2 * R * R - 2 * products[indexes], 0))
+        return indexes, distances
+
+
 class Geometry:
     _CURVATURE = 1 / R
     _MAX_LENGTH = R * math.pi
@@ -117,6 +219,41 @@ class Geometry:
         else:
             return math.degrees(precision)
 
+    @classmethod
+    def get_chord_by_length(cls, length: float) -> float:
+        # длина хорды (в метрах), стягивающей дугу большого круга длиной length метров
+        assert length >= 0, "Длина должна быть неотрицательна"
+        assert length <= cls._MAX_LENGTH, f"Поле length должно быть не больше {cls._MAX_LENGTH}."
+
+        return 2 * R * math.sin(length * cls._CURVATURE / 2)
+
+    @classmethod
+    def bounding_boxes(cls, coord: Coord, precision: float) -> list[tuple[float, float, float, float]]:
+        # precision указывается в градусах, результат: список прямоугольников (min_lat, max_lat, min_lon, max_lon).
+        # Прямоугольник, пересекающий меридиан ±180°, разбивается на два.
+        assert precision >= 0
+
+        latitude, longitude = coord.degrees.as_tuple()
+        min_lat = max(latitude - precision, -90)
+        max_lat = min(latitude + precision, 90)
+        max_abs_lat = max(abs(min_lat), abs(max_lat))
+        if max_abs_lat < 90:
+            lon_precision = precision / math.cos(math.radians(max_abs_lat))
+        else:
+            lon_precision = 180
+
+        if lon_precision >= 180:
+            return [(min_lat, max_lat, -180, 180)]
+
+        min_lon = longitude - lon_precision
+        max_lon = longitude + lon_precision
+        if min_lon < -180:
+            return [(min_lat, max_lat, -180, max_lon), (min_lat, max_lat, min_lon + 360, 180)]
+        if max_lon > 180:
+            return [(min_lat, max_lat, min_lon, 180), (min_lat, max_lat, -180, max_lon - 360)]
+
+        return [(min_lat, max_lat, min_lon, max_lon)]
+
     @classmethod
     def correct_precision_by_latitude(cls, coord: Coord, precision: float, in_radians: bool = False) -> float:
         assert precision >= 0
@@ -130,3 +267,120 @@ class Geometry:
 
         else:
             return 0
+
+
+def _spread_bits(value: int) -> int:
+    value &= 0xFFFFFFFF
+    value = (value | (value << 16)) & 0x0000FFFF0000FFFF
+    value = (value | (value << 8)) & 0x00FF00FF00FF00FF
+    value = (value | (value << 4)) & 0x0F0F0F0F0F0F0F0F
+    value = (value | (value << 2)) & 0x3333333333333333
+    value = (value | (value << 1)) & 0x5555555555555555
+    return value
+
+
+class Cell:
+    """
+    Пространственный ключ ячейки (Z-кривая, как в geohash): биты номеров ячеек по долготе и широте
+    чередуются, поэтому любая ячейка грубого уровня соответствует непрерывному диапазону ключей
+    уровня LEVEL, который обслуживается обычным btree-индексом.
+    """
+    LEVEL = SPATIAL_CELL_LEVEL
+    MAX_COVERING = SPATIAL_CELL_MAX_COVERING
+
+    @staticmethod
+    def _quantize(value: float, min_value: float, max_value: float, level: int) -> int:
+        count = 1 << level
+        index = int((value - min_value) / (max_value - min_value) * count)
+        return min(max(index, 0), count - 1)
+
+    @classmethod
+    def _cell_index(cls, latitude: float, longitude: float, level: int) -> tuple[int, int]:
+        return cls._quantize(longitude, -180, 180, level), cls._quantize(latitude, -90, 90, level)
+
+    @staticmethod
+    def _interleave(lon_index: int, lat_index: int) -> int:
+        return _spread_bits(lon_index) | (_spread_bits(lat_index) << 1)
+
+    @classmethod
+    def key(cls, latitude: float, longitude: float) -> int:
+        Coord.assert_coord(latitude, longitude)
+        return cls._interleave(*cls._cell_index(latitude, longitude, cls.LEVEL))
+
+    @classmethod
+    def _key_range(cls, lon_index: int, lat_index: int, level: int) -> tuple[int, int]:
+        return cls.key_range(cls._interleave(lon_index, lat_index), level)
+
+    @classmethod
+    def key_range(cls, key: int, level: int) -> tuple[int, int]:
+        """
+        Диапазон ключей уровня LEVEL [начало, конец], занимаемый ячейкой key уровня level.
+        """
+        shift = 2 * (cls.LEVEL - level)
+        return key << shift, ((key + 1) << shift) - 1
+
+    @classmethod
+    def parent(cls, key: int, level: int) -> int:
+        """
+        Ключ ячейки уровня level, содержащей ячейку key уровня LEVEL.
+        """
+        return key >> 2 * (cls.LEVEL - level)
+
+    @classmethod
+    def _covering_level(cls, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> int:
+        # максимальный уровень, на котором прямоугольник пересекает не больше 2x2 ячеек
+        level = cls.LEVEL
+        for span, full_span in ((max_lat - min_lat, 180), (max_lon - min_lon, 360)):
+            if span > 0:
+                level = min(level, int(math.floor(math.log2(full_span / span))))
+
+        return max(level, 0)
+
+    @classmethod
+    def _cells(cls, min_lat: float, max_lat: float, min_lon: float, max_lon: float, level: int):
+        lon_from, lat_from = cls._cell_index(min_lat, min_lon, level)
+        lon_to, lat_to = cls._cell_index(max_lat, max_lon, level)
+        return [(i, j) for i in range(lon_from, lon_to + 1) for j in range(lat_from, lat_to + 1)]
+
+    @classmethod
+    def count(cls, min_lat: float, max_lat: float, min_lon: float, max_lon: float, level: int) -> int:
+        lon_from, lat_from = cls._cell_index(min_lat, min_lon, level)
+        lon_to, lat_to = cls._cell_index(max_lat, max_lon, level)
+        return (lon_to - lon_from + 1) * (lat_to - lat_from + 1)
+
+    @classmethod
+    def keys(cls, min_lat: float, max_lat: float, min_lon: float, max_lon: float, level: int) -> list[int]:
+        """
+        Возвращает отсортированный список ключей ячеек уровня level, пересекающих прямоугольник координат.
+        """
+        return sorted(cls._interleave(i, j) for i, j in cls._cells(min_lat, max_lat, min_lon, max_lon, level))
+
+    @classmethod
+    def covering_ranges(cls, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> list[tuple[int, int]]:
+        """
+        Возвращает отсортированный список непересекающихся диапазонов ключей [начало, конец],
+        покрывающих прямоугольник координат (в градусах).
+        """
+        assert min_lat <= max_lat and min_lon <= max_lon, "Границы прямоугольника заданы неверно"
+        Coord.assert_coord(min_lat, min_lon)
+        Coord.assert_coord(max_lat, max_lon)
+
+        level = cls._covering_level(min_lat, max_lat, min_lon, max_lon)
+        cells = cls._cells(min_lat, max_lat, min_lon, max_lon, level)
+        while level < cls.LEVEL:
+            finer_cells = cls._cells(min_lat, max_lat, min_lon, max_lon, level + 1)
+            if len(finer_cells) > cls.MAX_COVERING:
+                break
+            level += 1
+            cells = finer_cells
+
+        ranges = sorted(cls._key_range(i, j, level) for i, j in cells)
+        merged = [ranges[0]]
+        for start, end in ranges[1:]:
+            last_start, last_end = merged[-1]
+            if start <= last_end + 1:
+                merged[-1] = (last_start, max(last_end, end))
+            else:
+                merged.append((start, end))
+
+        return merged
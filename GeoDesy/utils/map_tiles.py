@@ -0,0 +1,132 @@
+import hashlib
+import math
+import struct
+import uuid
+from config import MAP_TILE_COORD_SCALE
+
+__all__ = (
+    "TILE_MEDIA_TYPE", "tile_bounds", "in_tile", "encode_tile", "decode_tile", "tile_hash"
+)
+
+TILE_MEDIA_TYPE = "application/vnd.geodesy.tile"
+
+# заголовок тайла: сигнатура с версией формата, z, x, y, число точек
+_TILE_MAGIC = b"GDT1"
+_TILE_HEADER = struct.Struct("<4sBIII")
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """
+    Границы тайла веб-карты (схема XYZ, проекция Меркатора) в градусах: (min_lat, max_lat, min_lon, max_lon).
+    Крайние по широте тайлы продолжаются до полюсов, которые проекция Меркатора не отображает.
+    """
+    count = 1 << z
+    assert 0 <= x < count and 0 <= y < count, "Номер тайла вне допустимого диапазона"
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / count))))
+
+    max_lat = 90.0 if y == 0 else latitude(y)
+    min_lat = -90.0 if y == count - 1 else latitude(y + 1)
+    return min_lat, max_lat, x / count * 360 - 180, (x + 1) / count * 360 - 180
+
+
+def in_tile(bounds: tuple[float, float, float, float], latitude: float, longitude: float) -> bool:
+    """
+    Попадает ли точка в тайл с границами bounds (см. tile_bounds). Границы полуоткрытые: нижняя и левая
+    включаются, верхняя и правая - только на краю карты (90° широты, 180° долготы), поэтому точка на общей
+    границе соседних тайлов попадает ровно в один из них.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounds
+    return (min_lat <= latitude and (latitude < max_lat or max_lat == 90.0) and
+            min_lon <= longitude and (longitude < max_lon or max_lon == 180.0))
+
+
+def _write_varint(buffer: bytearray, value: int):
+    # zigzag: знаковое число в беззнаковое, чтобы малые по модулю разности занимали один-два байта
+    value = (value << 1) ^ (value >> 63)
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data, offset: int) -> tuple[int, int]:
+    value, shift = 0, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (value >> 1) ^ -(value & 1), offset
+
+
+def encode_tile(z: int, x: int, y: int, rows) -> bytes:
+    """
+    Кодирует точки тайла, строки (guid, latitude, longitude, subject_id), в двоичный формат:
+        заголовок _TILE_HEADER;
+        пары (широта, долгота), квантованные с шагом 1 / MAP_TILE_COORD_SCALE градуса относительно
+        нижнего левого угла тайла и записанные разностями с предыдущей точкой (zigzag varint);
+        коды субъектов (zigzag varint);
+        guid точек (по 16 байт).
+    Строки должны быть упорядочены (например, по ячейке и guid), чтобы содержимое тайла было стабильным,
+    а соседние точки - близкими, и разности - малыми.
+    """
+    min_lat, _, min_lon, _ = tile_bounds(z, x, y)
+    rows = list(rows)
+    buffer = bytearray(_TILE_HEADER.pack(_TILE_MAGIC, z, x, y, len(rows)))
+
+    previous_lat = previous_lon = 0
+    for _, latitude, longitude, _ in rows:
+        lat = round((latitude - min_lat) * MAP_TILE_COORD_SCALE)
+        lon = round((longitude - min_lon) * MAP_TILE_COORD_SCALE)
+        _write_varint(buffer, lat - previous_lat)
+        _write_varint(buffer, lon - previous_lon)
+        previous_lat, previous_lon = lat, lon
+
+    for row in rows:
+        _write_varint(buffer, row[3])
+
+    for row in rows:
+        buffer += row[0].bytes
+
+    return bytes(buffer)
+
+
+def decode_tile(data: bytes) -> dict:
+    """
+    Разбирает тайл, закодированный encode_tile.
+    Возвращает словарь с ключами z, x, y и points - списком строк (guid, latitude, longitude, subject_id).
+    """
+    magic, z, x, y, count = _TILE_HEADER.unpack_from(data)
+    assert magic == _TILE_MAGIC, "Данные не являются тайлом карты"
+    min_lat, _, min_lon, _ = tile_bounds(z, x, y)
+
+    offset = _TILE_HEADER.size
+    coords = []
+    lat = lon = 0
+    for _ in range(count):
+        delta_lat, offset = _read_varint(data, offset)
+        delta_lon, offset = _read_varint(data, offset)
+        lat, lon = lat + delta_lat, lon + delta_lon
+        coords.append((min_lat + lat / MAP_TILE_COORD_SCALE, min_lon + lon / MAP_TILE_COORD_SCALE))
+
+    subjects = []
+    for _ in range(count):
+        subject_id, offset = _read_varint(data, offset)
+        subjects.append(subject_id)
+
+    points = []
+    for i in range(count):
+        guid = uuid.UUID(bytes=bytes(data[offset:offset + 16]))
+        offset += 16
+        points.append((guid, *coords[i], subjects[i]))
+
+    assert offset == len(data), "Размер тайла не соответствует заголовку"
+    return {"z": z, "x": x, "y": y, "points": points}
+
+
+def tile_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
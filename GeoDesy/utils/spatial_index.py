@@ -0,0 +1,232 @@
+import os
+import struct
+import uuid
+from datetime import datetime
+import numpy as np
+from utils.geo import R, Cell
+
+__all__ = (
+    "SPATIAL_INDEX_COLUMNS", "SPATIAL_INDEX_DTYPE", "SpatialIndex", "write_snapshot", "read_snapshot"
+)
+
+# порядок полей строки индекса
+SPATIAL_INDEX_COLUMNS = ("guid", "latitude", "longitude", "subject_id", "cell", "x", "y", "z")
+
+# запись индекса и файла снимка (без выравнивания, 66 байт)
+SPATIAL_INDEX_DTYPE = np.dtype([
+    ("guid", "V16"), ("latitude", "<f8"), ("longitude", "<f8"), ("subject_id", "<i2"), ("cell", "<i8"),
+    ("x", "<f8"), ("y", "<f8"), ("z", "<f8"),
+])
+_GUID_DTYPE = SPATIAL_INDEX_DTYPE["guid"]
+
+# заголовок снимка: сигнатура, число записей, время создания (UTC, секунды от начала эпохи);
+# за записями следуют их guid, отсортированные для бинарного поиска (_GUID_DTYPE)
+_SNAPSHOT_MAGIC = b"GDSNAP02"
+_SNAPSHOT_HEADER = struct.Struct("<8sQd")
+_SNAPSHOT_CHUNK_SIZE = 10000
+
+
+def _rows_to_array(rows):
+    rows = list(rows)
+    array = np.empty(len(rows), dtype=SPATIAL_INDEX_DTYPE)
+    for i, (guid, *values) in enumerate(rows):
+        array[i] = (guid.bytes, *values)
+    return array
+
+
+def _record_to_row(record):
+    guid, *values = record.tolist()
+    return (uuid.UUID(bytes=bytes(guid)), *values)
+
+
+def write_snapshot(path, rows, created_at: datetime):
+    """
+    Записывает строки (в порядке SPATIAL_INDEX_COLUMNS, отсортированные по cell) в файл снимка.
+    Файл сначала пишется во временный, а затем атомарно подменяет старый.
+    """
+    tmp_path = f"{path}.tmp"
+    count = 0
+    guids = []
+    with open(tmp_path, "wb") as file:
+        file.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, 0, 0.0))
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= _SNAPSHOT_CHUNK_SIZE:
+                file.write(_rows_to_array(chunk).tobytes())
+                guids.extend(row[0].bytes for row in chunk)
+                count += len(chunk)
+                chunk.clear()
+
+        file.write(_rows_to_array(chunk).tobytes())
+        guids.extend(row[0].bytes for row in chunk)
+        count += len(chunk)
+        file.write(np.sort(np.array(guids, dtype=_GUID_DTYPE)).tobytes())
+
+        file.seek(0)
+        timestamp = (created_at - datetime(1970, 1, 1)).total_seconds()
+        file.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, count, timestamp))
+
+    os.replace(tmp_path, path)
+    return count
+
+
+def read_snapshot(path):
+    """
+    Отображает файл снимка в память только для чтения.
+    Возвращает массив записей, отсортированный массив их guid и время создания снимка.
+    """
+    with open(path, "rb") as file:
+        magic, count, timestamp = _SNAPSHOT_HEADER.unpack(file.read(_SNAPSHOT_HEADER.size))
+
+    assert magic == _SNAPSHOT_MAGIC, f"Файл {path} не является снимком пространственного индекса"
+    created_at = datetime.utcfromtimestamp(timestamp)
+    if count == 0:
+        return np.empty(0, dtype=SPATIAL_INDEX_DTYPE), np.empty(0, dtype=_GUID_DTYPE), created_at
+
+    array = np.memmap(path, dtype=SPATIAL_INDEX_DTYPE, mode="r", offset=_SNAPSHOT_HEADER.size, shape=(count,))
+    guids = np.memmap(path, dtype=_GUID_DTYPE, mode="r", offset=_SNAPSHOT_HEADER.size + array.nbytes, shape=(count,))
+    return array, guids, created_at
+
+
+class SpatialIndex:
+    """
+    Пространственный индекс точек.
+
+    Основная часть - массив записей SPATIAL_INDEX_DTYPE, отсортированный по ключу ячейки (utils.geo.Cell),
+    поэтому кандидаты для прямоугольника находятся бинарным поиском по диапазонам покрытия.
+    Основная часть не изменяется и может быть отображенным в память файлом снимка, общим для процессов.
+    Изменения, произошедшие после построения, хранятся в небольшой надстройке: новые и измененные строки
+    в overlay, скрытые строки основной части - в множестве hidden. Отсортированные guid основной части
+    (base_guids) позволяют бинарным поиском узнать, есть ли точка в основной части, и вести число точек
+    без просмотра всего массива.
+    """
+
+    def __init__(self, base=None, base_guids=None):
+        if base is None:
+            base = np.empty(0, dtype=SPATIAL_INDEX_DTYPE)
+        if base_guids is None:
+            base_guids = np.sort(base["guid"])
+        self._base = base
+        self._base_guids = base_guids
+        self._overlay = {}
+        self._hidden = set()
+        self._hidden_in_base = 0
+        self._overlay_array = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        base = _rows_to_array(rows)
+        base.sort(order="cell", kind="stable")
+        return cls(base)
+
+    @property
+    def is_mapped(self):
+        return isinstance(self._base, np.memmap)
+
+    def __len__(self):
+        return len(self._base) - self._hidden_in_base + len(self._overlay)
+
+    @property
+    def overlay_size(self):
+        return len(self._overlay)
+
+    def rows(self):
+        for record in self._visible(self._base):
+            yield _record_to_row(record)
+
+        yield from self._overlay.values()
+
+    def _in_base(self, guid):
+        key = np.array(guid, dtype=_GUID_DTYPE)
+        position = np.searchsorted(self._base_guids, key)
+        return position < len(self._base_guids) and self._base_guids[position] == key
+
+    def _hide(self, guid):
+        # guid - bytes; строка основной части скрывается один раз, даже если точка меняется несколько раз
+        if guid not in self._hidden:
+            self._hidden.add(guid)
+            if self._in_base(guid):
+                self._hidden_in_base += 1
+
+    def upsert(self, row):
+        row = tuple(row)
+        self._hide(row[0].bytes)
+        self._overlay[row[0]] = row
+        self._overlay_array = None
+
+    def remove(self, guid):
+        self._hide(guid.bytes)
+        self._overlay.pop(guid, None)
+        self._overlay_array = None
+
+    def compact(self):
+        base = _rows_to_array(self.rows())
+        base.sort(order="cell", kind="stable")
+        self._base = base
+        self._base_guids = np.sort(base["guid"])
+        self._overlay = {}
+        self._hidden = set()
+        self._hidden_in_base = 0
+        self._overlay_array = None
+
+    def _visible(self, records):
+        if not self._hidden or len(records) == 0:
+            return records
+
+        hidden = self._hidden
+        mask = np.fromiter((guid.tobytes() not in hidden for guid in records["guid"]), dtype=bool,
+                           count=len(records))
+        return records[mask]
+
+    def _get_overlay_array(self):
+        if self._overlay_array is None:
+            self._overlay_array = _rows_to_array(self._overlay.values())
+        return self._overlay_array
+
+    def _base_candidates(self, boxes):
+        cells = self._base["cell"]
+        slices = []
+        for min_lat, max_lat, min_lon, max_lon in boxes:
+            for start, end in Cell.covering_ranges(min_lat, max_lat, min_lon, max_lon):
+                left = np.searchsorted(cells, start, side="left")
+                right = np.searchsorted(cells, end, side="right")
+                if left < right:
+                    slices.append(np.arange(left, right))
+
+        if not slices:
+            return self._base[:0]
+
+        return self._visible(self._base[np.unique(np.concatenate(slices))])
+
+    @staticmethod
+    def _in_boxes(records, boxes):
+        latitudes = records["latitude"]
+        longitudes = records["longitude"]
+        mask = np.zeros(len(records), dtype=bool)
+        for min_lat, max_lat, min_lon, max_lon in boxes:
+            mask |= ((latitudes >= min_lat) & (latitudes <= max_lat) &
+                     (longitudes >= min_lon) & (longitudes <= max_lon))
+        return records[mask]
+
+    def _candidates(self, boxes):
+        # записи основной части и надстройки, попадающие в прямоугольники boxes
+        records = np.concatenate((self._base_candidates(boxes), self._get_overlay_array()))
+        return self._in_boxes(records, boxes)
+
+    def in_boxes(self, boxes):
+        return [_record_to_row(record) for record in self._candidates(boxes)]
+
+    def nearest(self, unit_vector, k, max_chord_square, boxes, subject_id=None):
+        """
+        Аналог MapQuerySet.nearest: возвращает не более k пар (строка, квадрат хорды на единичной сфере),
+        упорядоченных по расстоянию; при равных расстояниях предпочтение отдается субъекту subject_id.
+        """
+        records = self._candidates(boxes)
+        x, y, z = unit_vector
+        chord_squares = (records["x"] - x) ** 2 + (records["y"] - y) ** 2 + (records["z"] - z) ** 2
+        inside = chord_squares <= max_chord_square
+        records, chord_squares = records[inside], chord_squares[inside]
+
+        order = np.lexsort((records["subject_id"] != subject_id, np.round(R * np.sqrt(chord_squares), 2)))[:k]
+        return [(_record_to_row(records[i]), float(chord_squares[i])) for i in order]